@@ -1,34 +1,15 @@
 import wx
-import wx.grid
 import xml.etree.ElementTree as ET
 import wx.dataview as dv
-import uuid
-import xml.dom.minidom
-import os
 
+from up_data import parse_xml, write_pretty_xml
 
-def parse_xml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    return root
 
-
-# Try to pretty up the XML file, also set the right text encoding
-def prettify_xml(element):
-    rough_string = ET.tostring(element, 'utf-8')
-    reparsed = xml.dom.minidom.parseString(rough_string)
-
-    prettyxml = reparsed.toprettyxml()
-
-    prettyxml = os.linesep.join([s for s in prettyxml.splitlines()
-                                 if s.strip()])
-    return prettyxml
-
-
-# Write XML to a file
+# Write XML to a file, tab indented, without the blank lines the file's own
+# indentation would add
 def write_xml(root, file_path):
     with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(prettify_xml(root))
+        write_pretty_xml(root, f, indent="\t", canonical=True)
 
 
 class MyFrame(wx.Frame):
@@ -1,24 +1,8 @@
 import wx
 import wx.dataview as dv
 import xml.etree.ElementTree as ET
-import xml.dom.minidom
 
-
-def parse_xml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    return root
-
-
-def prettify_xml(element):
-    rough_string = ET.tostring(element, 'utf-8')
-    reparsed = xml.dom.minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="  ")
-
-
-def write_xml(root, file_path):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(prettify_xml(root))
+from up_data import infer_schema, parse_xml, write_xml
 
 
 class MyFrame(wx.Frame):
@@ -58,16 +42,19 @@ class MyFrame(wx.Frame):
         self.dvlc.ClearColumns()
         self.dvlc.DeleteAllItems()
 
-        # Get the first element and create columns based on its children
-        first_element = next(iter(self.root))
-        columns = [child.tag for child in first_element]
+        # Columns are the union of every item's tags, with misspelt tags
+        # mapped onto the column they belong to
+        columns, tag_index = infer_schema(self.root)
 
         for column in columns:
             self.dvlc.AppendTextColumn(column)
 
-        # Add rows to DataViewListCtrl
+        # Add rows to DataViewListCtrl, each field in its column. Reversed, so
+        # the first of a repeated tag wins, as in AbilityTable.
         for item in self.root:
-            values = [child.text if child.text else "" for child in item]
+            values = [""] * len(columns)
+            for child in reversed(item):
+                values[tag_index[child.tag]] = child.text if child.text else ""
             self.dvlc.AppendItem(values)
 
         # Create form for adding new items dynamically
@@ -112,7 +99,7 @@ class MyFrame(wx.Frame):
             # Proceed loading the file chosen by the user
             self.file_path = fileDialog.GetPath()
             try:
-                self.root = parse_xml(self.file_path)
+                self.root = parse_xml(self.file_path, canonical=True)
                 self.load_data_to_dvlc()
             except IOError:
                 wx.LogError("Cannot open file '%s'." % self.file_path)
@@ -130,7 +117,7 @@ class MyFrame(wx.Frame):
             # Save the current contents in the file
             self.file_path = fileDialog.GetPath()
             try:
-                write_xml(self.root, self.file_path)
+                write_xml(self.root, self.file_path, canonical=True)
                 wx.MessageBox("Data saved to file!", "Info", wx.OK | wx.ICON_INFORMATION)
             except IOError:
                 wx.LogError("Cannot save current data in file '%s'." % self.file_path)
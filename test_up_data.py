@@ -0,0 +1,233 @@
+import os
+import shutil
+import tracemalloc
+import xml.dom.minidom
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from up_data import (AbilityTable, DuplicateKeyError, ValueCounts, count_values, get_entry, iter_entries, parse_xml,
+                     prettify_xml, write_xml)
+from up_data_gen import generate_dataset
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.xml")
+
+
+# Peak traced bytes while streaming every entry of a file, keeping none
+def streamed_peak(file_path):
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in iter_entries(file_path))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return count, peak
+
+
+def test_iter_entries_memory_is_flat(tmp_path):
+    small_path = str(tmp_path / "small.xml")
+    large_path = str(tmp_path / "large.xml")
+    generate_dataset(small_path, 1_000)
+    generate_dataset(large_path, 20_000)
+
+    small_count, small_peak = streamed_peak(small_path)
+    large_count, large_peak = streamed_peak(large_path)
+    assert (small_count, large_count) == (1_000, 20_000)
+    # 20 times the entries, but only one entry is held at a time
+    assert large_peak < 2 * small_peak
+
+
+def test_pretty_xml_matches_minidom():
+    root = parse_xml(DATA_PATH)
+    expected = xml.dom.minidom.parseString(ET.tostring(root, 'utf-8')).toprettyxml(indent="  ")
+    assert prettify_xml(root) == expected
+
+
+def test_canonical_save_load_save_is_stable(tmp_path):
+    first = str(tmp_path / "first.xml")
+    second = str(tmp_path / "second.xml")
+    write_xml(parse_xml(DATA_PATH, canonical=True), first, canonical=True)
+    write_xml(parse_xml(first, canonical=True), second, canonical=True)
+    with open(first, 'rb') as f1, open(second, 'rb') as f2:
+        assert f1.read() == f2.read()
+
+
+# An AbilityTable is always written canonically
+def test_table_save_load_save_is_stable(tmp_path):
+    first = str(tmp_path / "first.xml")
+    second = str(tmp_path / "second.xml")
+    write_xml(AbilityTable.from_file(DATA_PATH), first)
+    write_xml(AbilityTable.from_file(first), second)
+    with open(first, 'rb') as f1, open(second, 'rb') as f2:
+        assert f1.read() == f2.read()
+
+
+def key_table():
+    table = AbilityTable(["id", "num", "name"])
+    table.append_rows([{"id": "a", "num": "1"}, {"id": "b", "num": "2"}, {"id": "c", "num": "1", "name": "dup"},
+                       {"num": ""}], check_keys=False)
+    return table
+
+
+# The key indexes must say what a fresh build from the columns would
+def assert_keys_current(table):
+    for column in ("id", "num"):
+        keys = table.key_index(column)
+        fresh = AbilityTable(table.columns)
+        fresh.append_rows([dict(zip(table.columns, table.row(i))) for i in range(len(table))], check_keys=False)
+        assert keys == fresh.key_index(column)
+        assert table.duplicate_keys[column] == fresh.duplicate_keys[column]
+
+
+def test_key_index_finds_first_of_duplicates():
+    table = key_table()
+    assert table.find_by_id("c") == 2
+    assert table.find_by_num("1") == 0
+    assert table.find_by_num("") is None
+    assert table.duplicate_keys == {"id": set(), "num": {"1"}}
+    assert_keys_current(table)
+
+
+def test_key_index_rejects_duplicates():
+    table = key_table()
+    table.build_keys()
+    with pytest.raises(DuplicateKeyError):
+        table.append_row({"id": "a"})
+    with pytest.raises(DuplicateKeyError):
+        table.set_value(1, table.tag_index["id"], "c")
+    with pytest.raises(DuplicateKeyError):
+        table.append_rows([{"id": "x"}, {"id": "x"}])
+    assert len(table) == 4
+    assert_keys_current(table)
+
+
+def test_key_index_follows_edits():
+    table = key_table()
+    table.build_keys()
+    table.set_value(1, table.tag_index["id"], "z")
+    assert table.find_by_id("b") is None and table.find_by_id("z") == 1
+    table.delete_row(0)
+    assert table.find_by_id("c") == 1
+    assert table.find_by_num("1") == 1
+    assert_keys_current(table)
+    table.append_row({"id": "a", "num": "3"})
+    assert table.find_by_id("a") == 3
+    assert_keys_current(table)
+
+
+def test_key_index_duplicates_follow_edits():
+    table = key_table()
+    table.build_keys()
+    # Setting a key to the value it has keeps it with the first row
+    table.set_value(2, table.tag_index["num"], "1")
+    assert table.find_by_num("1") == 0
+    assert_keys_current(table)
+    # Deleting the later copy leaves the value unduplicated
+    table.delete_row(2)
+    assert table.duplicate_keys["num"] == set()
+    assert_keys_current(table)
+
+    table = key_table()
+    table.build_keys()
+    table.set_value(2, table.tag_index["num"], "5")
+    assert table.duplicate_keys["num"] == set() and table.find_by_num("5") == 2
+    assert_keys_current(table)
+
+
+ODD_XML = """<?xml version="1.0"?>
+<root a="1">x
+  <abilities k="v">
+    <ability id="3"><name lang="en">N<b/></name>stray<num>1</num><num>2</num></ability>
+    <ability><num>3</num></ability>
+  </abilities>
+  <meta/>
+</root>
+"""
+
+
+def test_dropped_parts_are_noted(tmp_path):
+    path = tmp_path / "odd.xml"
+    path.write_text(ODD_XML, encoding='utf-8')
+    expected = {
+        "attributes of <root>", "text between the elements of <root>", "<meta> elements besides <abilities>",
+        "attributes of <abilities>", "attributes of <ability>", "attributes of <name>",
+        "elements nested in <name>", "text between the elements of <ability>", "repeated <num> fields",
+    }
+    table = AbilityTable.from_file(str(path))
+    assert table.root_tag == "root"
+    assert table.column("num") == ["1", "3"]
+    assert table.dropped == expected
+    assert table.copy().dropped == expected
+    assert AbilityTable.from_root(parse_xml(str(path))).dropped == expected
+
+
+def test_tabular_file_drops_nothing(tmp_path):
+    path = str(tmp_path / "table.xml")
+    write_xml(AbilityTable.from_file(DATA_PATH), path)
+    assert AbilityTable.from_file(path).dropped == set()
+    # data.xml has a stray bit of text in one entry
+    assert AbilityTable.from_file(DATA_PATH).dropped == {"text between the elements of <ability>"}
+
+
+def test_cache_keeps_dropped(tmp_path):
+    from up_data_cache import load_table, read_cache
+
+    path = tmp_path / "odd.xml"
+    path.write_text(ODD_XML, encoding='utf-8')
+    table = load_table(str(path))
+    assert read_cache(str(path)).dropped == table.dropped != set()
+
+
+def test_get_entry_unescapes_keys(tmp_path):
+    path = tmp_path / "data.xml"
+    path.write_text("<updata><abilities>"
+                    "<ability><id>a&amp;b</id><num>&#49;0</num><name>Escaped</name></ability>"
+                    "<ability><id><![CDATA[<c>]]></id><num>11</num><name>CDATA</name></ability>"
+                    "<ability><id>plain</id><num>12</num><name>Plain</name></ability>"
+                    "</abilities></updata>", encoding='utf-8')
+    assert get_entry(str(path), "a&b").findtext("name") == "Escaped"
+    assert get_entry(str(path), "10", key="num").findtext("name") == "Escaped"
+    assert get_entry(str(path), "<c>").findtext("name") == "CDATA"
+    assert get_entry(str(path), "plain").findtext("name") == "Plain"
+    # The same from the saved index
+    assert get_entry(str(path), "a&b").findtext("name") == "Escaped"
+
+
+def test_get_entry_has_no_empty_key(tmp_path):
+    path = str(tmp_path / "data.xml")
+    shutil.copy(DATA_PATH, path)
+    assert get_entry(path, "") is None
+    assert get_entry(path, "", key="num") is None
+
+
+def test_count_values():
+    assert count_values(["b", "a", "b", ""]) == (["b", "a", ""], [2, 1, 1])
+
+
+# Edits made the way the list model makes them: remove_row() before a row
+# changes or is deleted, add_row() once it has changed or been appended
+def test_value_counts_follow_edits():
+    table = AbilityTable(["origin", "isavailable"])
+    table.append_rows([{"origin": "Generation III"}, {"origin": "Generation IV", "isavailable": "1"},
+                       {"origin": "Generation III", "isavailable": ""}])
+    counts = ValueCounts(table)
+    assert counts.count_values("origin") == (["Generation III", "Generation IV"], [2, 1])
+    # A missing field counts as ""
+    assert counts.count_values("isavailable") == (["", "1"], [2, 1])
+
+    col = table.tag_index["origin"]
+    counts.remove_row(0)
+    table.set_value(0, col, "Generation V")
+    counts.add_row(0)
+    table.append_row({"origin": "Generation IV", "isavailable": "1"})
+    counts.add_row(3)
+    counts.delete_row(1)
+    table.delete_row(1)
+    assert counts.count_values("origin") == (["Generation III", "Generation IV", "Generation V"], [1, 1, 1])
+    assert counts.count_values("isavailable") == (["", "1"], [2, 1])
+    # Values no entry has any more are gone, not left at 0
+    counts.remove_row(0)
+    table.set_value(0, col, "Generation III")
+    counts.add_row(0)
+    assert counts.count_values("origin") == (["Generation III", "Generation IV"], [2, 1])
+    assert counts.count_values("origin") == ValueCounts(table).count_values("origin")
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from up_data import AbilityTable, write_xml
+from up_data_cache import cache_path_for, load_table, read_cache
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    table = AbilityTable(["id", "num", "name"])
+    table.append_rows([{"id": "a", "num": "1", "name": "Stench"},
+                       {"id": "b", "name": ""},
+                       {"id": "c", "num": "3", "name": "Speed Boost"}])
+    path = str(tmp_path / "data.xml")
+    write_xml(table, path)
+    return path
+
+
+def rewrite(path, old, new):
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text.replace(old, new))
+
+
+def test_cache_round_trip(data_path):
+    table = load_table(data_path)
+    assert os.path.exists(cache_path_for(data_path))
+    cached = read_cache(data_path)
+    assert cached.columns == table.columns
+    assert cached.values == table.values == [["a", "b", "c"], ["1", None, "3"], ["Stench", "", "Speed Boost"]]
+    assert load_table(data_path).values == table.values
+
+
+# Same size, so only the content hash tells
+def test_changed_file_invalidates_cache(data_path):
+    load_table(data_path)
+    rewrite(data_path, "Stench", "Stink!")
+    assert read_cache(data_path) is None
+    assert load_table(data_path).column("name")[0] == "Stink!"
+    assert read_cache(data_path).column("name")[0] == "Stink!"
+
+
+# A new mtime alone (e.g. a copy or touch) does not throw the cache away
+def test_touched_file_keeps_cache(data_path):
+    load_table(data_path)
+    os.utime(data_path, ns=(0, 10 ** 18))
+    assert read_cache(data_path) is not None
+
+
+def test_bad_cache_is_ignored(data_path):
+    load_table(data_path)
+    with open(cache_path_for(data_path), 'wb') as f:
+        f.write(b"not an npz")
+    assert read_cache(data_path) is None
+    assert load_table(data_path).column("id") == ["a", "b", "c"]
+
+
+def test_no_cache(data_path):
+    load_table(data_path, use_cache=False)
+    assert not os.path.exists(cache_path_for(data_path))
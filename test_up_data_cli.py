@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from up_data import AbilityTable, parse_xml, write_xml
+from up_data_cache import cache_path_for
+from up_data_cli import main, validate_file
+
+
+def write_table(path, rows):
+    table = AbilityTable(["id", "num", "name", "origin"])
+    table.append_rows(rows, check_keys=False)
+    write_xml(table, str(path))
+    return str(path)
+
+
+ROWS = [
+    {"id": "a", "num": "1", "name": "Stench", "origin": ""},
+    {"id": "b", "num": "2", "name": "Drizzle", "origin": "Generation III"},
+    {"id": "c", "num": "3", "name": "Speed Boost"},
+]
+
+
+def test_stats_counts_distinct_filled_values(tmp_path, capsys):
+    path = write_table(tmp_path / "data.xml", ROWS)
+    assert main(["stats", path]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[-1].split() == ["origin", "1", "1"]
+
+
+def test_cache_is_opt_in(tmp_path, capsys):
+    path = write_table(tmp_path / "data.xml", ROWS)
+    assert main(["query", path, "num >= 2", "--count"]) == 0
+    assert main(["stats", path]) == 0
+    assert not os.path.exists(cache_path_for(path))
+    assert main(["query", path, "num >= 2", "--count", "--cache"]) == 0
+    assert os.path.exists(cache_path_for(path))
+    assert capsys.readouterr().out.splitlines()[0] == "2"
+
+
+def test_validate_reports_duplicate_keys(tmp_path):
+    path = write_table(tmp_path / "data.xml", ROWS + [{"id": "a", "num": "4"}, {"id": "d", "num": "2"}])
+    entries, errors, warnings = validate_file(path)
+    assert entries == 5
+    assert errors == ["id 'a' is used by entries 0, 3", "num '2' is used by entries 1, 4"]
+
+
+ROOTED_XML = """<?xml version="1.0"?>
+<root a="1"><meta>important</meta><abilities k="v"><ability><id>a</id><name>Stench</name></ability></abilities></root>
+"""
+
+
+@pytest.mark.parametrize("command", ["normalize", "convert"])
+def test_rewrite_in_place_keeps_what_it_would_lose(tmp_path, capsys, command):
+    path = tmp_path / "data.xml"
+    path.write_text(ROOTED_XML, encoding='utf-8')
+    argv = [command, str(path)] if command == "normalize" else [command, str(path), str(path)]
+    assert main(argv) == 1
+    assert path.read_text(encoding='utf-8') == ROOTED_XML
+    assert "<meta> elements besides <abilities>" in capsys.readouterr().err
+    assert not os.path.exists(str(path) + ".tmp")
+
+    assert main(argv + ["--force"]) == 0
+    root = parse_xml(str(path))
+    assert root.tag == "root" and root.find("meta") is None
+    assert root.find("abilities/ability/name").text == "Stench"
+
+
+def test_normalize_elsewhere_warns(tmp_path, capsys):
+    path = tmp_path / "data.xml"
+    path.write_text(ROOTED_XML, encoding='utf-8')
+    out_path = str(tmp_path / "out.xml")
+    assert main(["normalize", str(path), "-o", out_path]) == 0
+    assert "attributes of <root> not written" in capsys.readouterr().err
+    assert parse_xml(out_path).tag == "root"
+    # Nothing is lost from a file that only holds entries
+    assert main(["normalize", out_path]) == 0
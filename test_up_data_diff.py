@@ -0,0 +1,77 @@
+import os
+
+from up_data import AbilityTable, write_xml
+from up_data_diff import diff_counts, format_diff, iter_diff
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_table(path, rows):
+    table = AbilityTable(["id", "num", "name", "effect"])
+    table.append_rows(rows, check_keys=False)
+    write_xml(table, str(path))
+    return str(path)
+
+
+OLD_ROWS = [
+    {"id": "a", "num": "1", "name": "Stench", "effect": "May cause  flinching."},
+    {"id": "b", "num": "2", "name": "Drizzle"},
+    {"id": "c", "num": "3", "name": "Speed Boost"},
+    {"num": "-", "name": "No id"},
+]
+
+
+def test_same_content_has_no_changes(tmp_path):
+    old = write_table(tmp_path / "old.xml", OLD_ROWS)
+    assert list(iter_diff(old, old)) == []
+    # The data files only differ in their layout
+    assert diff_counts(os.path.join(HERE, "data.xml"), os.path.join(HERE, "data2.xml")) == \
+        {"added": 0, "removed": 0, "changed": 0}
+
+
+def test_changes(tmp_path):
+    old = write_table(tmp_path / "old.xml", OLD_ROWS)
+    new = write_table(tmp_path / "new.xml", [
+        {"id": "c", "num": "3", "name": "Speed Boost"},
+        {"id": "a", "num": "1", "name": "Stink", "effect": "May cause  flinching."},
+        {"num": "-", "name": "No id"},
+        {"id": "d", "num": "4", "name": "Battle Armor"},
+    ])
+    changes = sorted(iter_diff(old, new))
+    assert changes == [
+        ("added", "d", {"id": "d", "num": "4", "name": "Battle Armor"}),
+        ("changed", "a", {"name": ("Stench", "Stink")}),
+        ("removed", "b", {"id": "b", "num": "2", "name": "Drizzle"}),
+    ]
+    assert format_diff(iter_diff(old, new))[-1] == "1 added, 1 removed, 1 changed"
+
+
+def test_entries_without_id_match_by_content(tmp_path):
+    old = write_table(tmp_path / "old.xml", OLD_ROWS)
+    new_rows = [dict(row) for row in OLD_ROWS]
+    new_rows[3]["name"] = "Still no id"
+    new = write_table(tmp_path / "new.xml", new_rows)
+    assert diff_counts(old, new) == {"added": 1, "removed": 1, "changed": 0}
+
+
+def test_whitespace(tmp_path):
+    old = write_table(tmp_path / "old.xml", OLD_ROWS)
+    new_rows = [dict(row) for row in OLD_ROWS]
+    new_rows[0]["effect"] = "May cause\n    flinching. "
+    new = write_table(tmp_path / "new.xml", new_rows)
+    assert diff_counts(old, new) == {"added": 0, "removed": 0, "changed": 0}
+    assert list(iter_diff(old, new, ignore_whitespace=False)) == [
+        ("changed", "a", {"effect": ("May cause  flinching.", "May cause\n    flinching. ")})]
+
+
+def test_diff_against_table(tmp_path):
+    old = write_table(tmp_path / "old.xml", OLD_ROWS)
+    table = AbilityTable.from_file(old)
+    table.delete_row(1)
+    assert diff_counts(old, table) == {"added": 0, "removed": 1, "changed": 0}
+
+
+def test_repeated_ids(tmp_path):
+    old = write_table(tmp_path / "old.xml", OLD_ROWS + [{"id": "a", "name": "Copy"}])
+    new = write_table(tmp_path / "new.xml", OLD_ROWS)
+    assert list(iter_diff(old, new)) == [("removed", ("a", 1), {"id": "a", "name": "Copy"})]
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+import pytest
+
+import up_data_export
+from up_data import AbilityTable, write_xml
+from up_data_export import export_file, export_format, write_columns
+from up_data_import import import_rows
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.xml")
+
+
+@pytest.fixture(scope="module")
+def table():
+    return AbilityTable.from_file(DATA_PATH)
+
+
+def filled(table, column):
+    return [value or "" for value in table.column(column)]
+
+
+@pytest.mark.parametrize("out", ["out.csv", "out.tsv", "out.jsonl"])
+@pytest.mark.parametrize("from_file", [True, False])
+def test_records_round_trip(tmp_path, table, out, from_file):
+    path = str(tmp_path / out)
+    assert export_file(DATA_PATH if from_file else table, path) == len(table)
+    rows = import_rows(path, table.columns, fill_ids=False)
+    assert len(rows) == len(table)
+    for column in table.columns:
+        assert [row.get(column, "") for row in rows] == filled(table, column)
+
+
+@pytest.mark.parametrize("out", ["out.npz", "columns"])
+@pytest.mark.parametrize("from_file", [True, False])
+def test_columns_round_trip(tmp_path, table, monkeypatch, out, from_file):
+    monkeypatch.setattr(up_data_export, "COLUMN_CHUNK_BYTES", 1000)  # Many pieces per column
+    path = str(tmp_path / out)
+    assert export_file(DATA_PATH if from_file else table, path) == len(table)
+    if out == "columns":
+        arrays = {name[:-4]: np.load(os.path.join(path, name)) for name in os.listdir(path)}
+    else:
+        with np.load(path) as saved:
+            arrays = {column: saved[column] for column in saved.files}
+    assert sorted(arrays) == sorted(table.columns)
+    for column in table.columns:
+        assert arrays[column].tolist() == filled(table, column)
+
+
+def test_columns_appearing_late(tmp_path):
+    records = [{"id": "a"}, {"id": "b", "name": "Drizzle"}, {"name": "Ünnerve"}]
+    path = str(tmp_path / "out.npz")
+    assert write_columns(records, path) == 3
+    with np.load(path) as saved:
+        assert saved.files == ["id", "name"]
+        assert saved["id"].tolist() == ["a", "b", ""]
+        assert saved["name"].tolist() == ["", "Drizzle", "Ünnerve"]
+    assert write_columns(records, path, ["name", "origin"]) == 3
+    with np.load(path) as saved:
+        assert saved["name"].tolist() == ["", "Drizzle", "Ünnerve"]
+        assert saved["origin"].tolist() == ["", "", ""]
+
+
+def test_no_entries(tmp_path):
+    path = str(tmp_path / "empty.xml")
+    write_xml(AbilityTable(["id"]), path)
+    assert export_file(path, str(tmp_path / "out.npz")) == 0
+    assert export_file(AbilityTable(["id"]), str(tmp_path / "table.npz")) == 0
+    with np.load(str(tmp_path / "table.npz")) as saved:
+        assert saved["id"].shape == (0,)
+
+
+def test_export_format(tmp_path):
+    assert export_format("out.NDJSON") == "jsonl"
+    assert export_format(str(tmp_path / "columns")) == "npy"
+    (tmp_path / "columns.v2").mkdir()
+    assert export_format(str(tmp_path / "columns.v2")) == "npy"
+    with pytest.raises(ValueError):
+        export_format(str(tmp_path / "out.xlsx"))
+    with pytest.raises(ValueError):
+        export_file(DATA_PATH, str(tmp_path / "out.xlsx"))
+    assert not os.path.exists(str(tmp_path / "out.xlsx"))
@@ -0,0 +1,84 @@
+import pytest
+
+from up_data import AbilityTable
+from up_data_import import ColumnMapping, RecordImportError, import_file, import_rows
+
+COLUMNS = ["id", "num", "name", "de_name", "pkmn_hidden", "isavailable"]
+
+
+@pytest.mark.parametrize("name, column", [
+    ("name", "name"),
+    ("Name", "name"),
+    ("DE Name", "de_name"),
+    ("de-name", "de_name"),
+    (" ID ", "id"),
+    ("pkmn_hiden", "pkmn_hidden"),
+    ("PKMN Hiden", "pkmn_hidden"),
+    ("origin", "origin"),
+])
+def test_column_mapping(name, column):
+    assert ColumnMapping(COLUMNS).column(name) == column
+
+
+@pytest.mark.parametrize("name", ["1st", "has space", "xmlthing", ""])
+def test_invalid_new_column(name):
+    with pytest.raises(RecordImportError):
+        ColumnMapping(COLUMNS).column(name)
+
+
+def test_two_fields_for_one_column():
+    mapping = ColumnMapping(COLUMNS)
+    mapping.column("de_name")
+    with pytest.raises(RecordImportError):
+        mapping.column("DE Name")
+
+
+def test_import_csv(tmp_path):
+    path = tmp_path / "records.csv"
+    path.write_text("\ufeffNum,Name,DE Name,origin\n150,Pressure,Erzwinger,Generation III\n151,Unnerve,,\n",
+                    encoding='utf-8')
+    rows = import_rows(str(path), COLUMNS)
+    assert [row["num"] for row in rows] == ["150", "151"]
+    assert rows[0]["de_name"] == "Erzwinger" and rows[0]["origin"] == "Generation III"
+    # Empty fields are kept
+    assert rows[1]["de_name"] == "" and rows[1]["origin"] == ""
+    # Every row gets a new id, each different
+    assert all(row["id"] for row in rows) and rows[0]["id"] != rows[1]["id"]
+
+
+def test_import_jsonl(tmp_path):
+    path = tmp_path / "records.jsonl"
+    path.write_text('{"num": 152, "isavailable": true, "id": "x", "name": null}\n\n{"num": "153", "name": ""}\n',
+                    encoding='utf-8')
+    rows = import_rows(str(path), COLUMNS, fill_ids=False)
+    assert rows[0] == {"num": "152", "isavailable": "1", "id": "x"}
+    assert rows[1] == {"num": "153", "name": ""}
+
+
+@pytest.mark.parametrize("text", ['{"num": [1]}\n', '[1, 2]\n', '{"num": \n'])
+def test_bad_jsonl(tmp_path, text):
+    path = tmp_path / "records.jsonl"
+    path.write_text(text, encoding='utf-8')
+    with pytest.raises(RecordImportError):
+        import_rows(str(path), COLUMNS)
+
+
+def test_import_file_checks_keys(tmp_path):
+    table = AbilityTable(COLUMNS)
+    table.append_row({"id": "a", "num": "1"})
+    path = tmp_path / "records.tsv"
+    path.write_text("id\tnum\nb\t2\nc\t1\n", encoding='utf-8')
+    with pytest.raises(ValueError):
+        import_file(table, str(path))
+    assert len(table) == 1
+    assert import_file(table, str(path), check_keys=False) == 2
+    assert table.column("id") == ["a", "b", "c"]
+
+
+def test_import_file_keeps_empty_fields(tmp_path):
+    table = AbilityTable(COLUMNS)
+    path = tmp_path / "records.csv"
+    path.write_text("num,de_name,colour\n1,,\n", encoding='utf-8')
+    import_file(table, str(path))
+    assert table.columns[-1] == "colour"
+    assert table.column("de_name") == [""] and table.column("colour") == [""]
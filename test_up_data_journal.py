@@ -0,0 +1,166 @@
+import shutil
+
+import pytest
+
+from up_data import AbilityTable, write_xml
+from up_data_journal import EditJournal, journal_path_for, read_journal
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    table = AbilityTable(["id", "num", "name"])
+    table.append_rows([{"id": "a", "num": "1", "name": "Stench"},
+                       {"id": "b", "num": "2", "name": "Drizzle"},
+                       {"id": "c", "num": "3", "name": "Speed Boost"}])
+    path = str(tmp_path / "data.xml")
+    write_xml(table, path)
+    return path
+
+
+def names(table):
+    return table.column("name")
+
+
+# Open the file with its journal, as the editor does
+def reopen(path):
+    table = AbilityTable.from_file(path)
+    journal, replayed = EditJournal.open(path, table)
+    journal.close()
+    return table, replayed
+
+
+def edit(path):
+    table = AbilityTable.from_file(path)
+    journal, _ = EditJournal.open(path, table)
+    table.set_value(0, table.tag_index["name"], "Stink")
+    journal.set(0, "name", "Stink")
+    table.delete_row(1)
+    journal.delete(1)
+    table.append_row({"id": "d", "name": "Static"})
+    journal.add({"id": "d", "name": "Static"})
+    return table, journal
+
+
+def test_replay(data_path):
+    table, journal = edit(data_path)
+    journal.close()
+    replayed_table, replayed = reopen(data_path)
+    assert replayed == 3
+    assert names(replayed_table) == names(table) == ["Stink", "Speed Boost", "Static"]
+
+
+def test_truncated_tail_is_dropped(data_path):
+    _, journal = edit(data_path)
+    journal.close()
+    with open(journal_path_for(data_path), 'ab') as f:
+        f.write(b'["set",0,"name","Half')  # Cut short by a crash
+
+    table, replayed = reopen(data_path)
+    assert replayed == 3
+    assert names(table) == ["Stink", "Speed Boost", "Static"]
+    # The journal was rewritten without the partial line
+    with open(journal_path_for(data_path), 'rb') as f:
+        assert f.read().endswith(b"\n")
+    assert len(read_journal(journal_path_for(data_path))[1]) == 3
+
+
+def test_journal_for_another_file_is_set_aside(data_path):
+    _, journal = edit(data_path)
+    journal.close()
+    write_xml(AbilityTable(["id"]), data_path)
+    table, replayed = reopen(data_path)
+    assert replayed == 0 and len(table) == 0
+    assert read_journal(journal_path_for(data_path) + ".old")[1]
+
+
+def test_compact(data_path):
+    table, journal = edit(data_path)
+    assert journal.compact(wait=True)
+    table.set_value(0, table.tag_index["name"], "Smell")
+    journal.set(0, "name", "Smell")
+    journal.close()
+
+    assert names(AbilityTable.from_file(data_path)) == ["Stink", "Speed Boost", "Static"]
+    replayed_table, replayed = reopen(data_path)
+    assert replayed == 1
+    assert names(replayed_table) == ["Smell", "Speed Boost", "Static"]
+
+
+# A crash while compacting, after the file was replaced but before the new
+# journal was renamed into place, leaves the new journal as .tmp next to the
+# old one. Its edits must be replayed once, and the old ones not again.
+def test_crash_while_compacting(data_path):
+    path = journal_path_for(data_path)
+    table, journal = edit(data_path)
+    shutil.copy(path, path + ".before")
+    assert journal.compact(wait=True)
+    table.set_value(0, table.tag_index["name"], "Smell")
+    journal.set(0, "name", "Smell")
+    journal.close()
+    shutil.move(path, path + ".tmp")
+    shutil.move(path + ".before", path)
+
+    replayed_table, replayed = reopen(data_path)
+    assert replayed == 1
+    assert names(replayed_table) == ["Smell", "Speed Boost", "Static"]
+
+
+def test_create_does_not_replay(data_path):
+    _, journal = edit(data_path)
+    journal.close()
+    table = AbilityTable.from_file(data_path)
+    EditJournal.create(data_path, table).close()
+    assert names(table) == ["Stench", "Drizzle", "Speed Boost"]
+    assert reopen(data_path)[1] == 0
+
+
+# Only the caller compacts, as that rewrites the file: not even a large import
+def test_no_automatic_compaction(data_path):
+    with open(data_path, 'rb') as f:
+        before = f.read()
+    table = AbilityTable.from_file(data_path)
+    journal, _ = EditJournal.open(data_path, table)
+    rows = [{"id": f"x{n}", "name": "Imported"} for n in range(2000)]
+    table.append_rows(rows)
+    journal.add_rows(rows)
+    journal.close()
+    with open(data_path, 'rb') as f:
+        assert f.read() == before
+    assert reopen(data_path)[1] == 2000
+
+
+@pytest.mark.parametrize("line", [
+    b'["set","3","name","x"]\n',
+    b'["set",0,"name"]\n',
+    b'["delete",-1]\n',
+    b'["delete",true]\n',
+    b'["add",{"name":1}]\n',
+    b'["base",["1","2","3","4"]]\n',
+    b'["rename",0]\n',
+    b'[]\n',
+    b'7\n',
+    b'"set"\n',
+    b'{"set":0}\n',
+])
+def test_bad_record_ends_replay(data_path, line):
+    _, journal = edit(data_path)
+    journal.close()
+    with open(journal_path_for(data_path), 'ab') as f:
+        f.write(line)
+        f.write(b'["set",0,"name","After"]\n')
+
+    table, replayed = reopen(data_path)
+    assert replayed == 3
+    assert names(table) == ["Stink", "Speed Boost", "Static"]
+    # The journal was rewritten without the bad record and what follows it
+    assert len(read_journal(journal_path_for(data_path))[1]) == 3
+
+
+@pytest.mark.parametrize("base", [b'["base",["x","2","3","4"]]\n', b'["base","key"]\n', b'["set",0,"name","x"]\n'])
+def test_bad_base_is_set_aside(data_path, base):
+    with open(journal_path_for(data_path), 'wb') as f:
+        f.write(base)
+        f.write(b'["set",0,"name","x"]\n')
+    table, replayed = reopen(data_path)
+    assert replayed == 0
+    assert names(table) == ["Stench", "Drizzle", "Speed Boost"]
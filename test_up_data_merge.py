@@ -0,0 +1,57 @@
+import pytest
+
+from up_data import AbilityTable, write_xml
+from up_data_merge import MergeConflictError, load_tables, merge_files
+
+
+class Cancelled(Exception):
+    pass
+
+
+@pytest.fixture
+def paths(tmp_path):
+    paths = []
+    for n, rows in enumerate([
+        [{"id": "a", "num": "1", "name": "Stench"}, {"id": "b", "num": "2", "name": "Drizzle"}],
+        [{"id": "b", "num": "2", "name": "Drizzle", "de_name": "Niesel"}, {"id": "c", "name": "Speed Boost"}],
+    ]):
+        table = AbilityTable(list(dict.fromkeys(column for row in rows for column in row)))
+        table.append_rows(rows)
+        paths.append(str(tmp_path / f"data_{n}.xml"))
+        write_xml(table, paths[-1])
+    return paths
+
+
+def test_load_tables_in_processes(paths):
+    tables = load_tables(paths, workers=2)
+    assert [table.column("id") for table in tables] == [["a", "b"], ["b", "c"]]
+    assert tables[1].columns == ["id", "num", "name", "de_name"]
+    assert tables[1].column("num") == ["2", None]
+
+
+def test_merge_files(paths):
+    table, conflicts = merge_files(paths, workers=2)
+    assert table.column("id") == ["a", "b", "c"]
+    assert table.column("de_name") == [None, "Niesel", None]
+    assert conflicts == [("b", paths[0], paths[1])]
+    with pytest.raises(MergeConflictError):
+        merge_files(paths, "error")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_load_can_be_abandoned(paths, workers):
+    calls = []
+
+    def progress(done, total):
+        calls.append((done, total))
+        raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        load_tables(paths, workers, progress=progress)
+    assert calls == [(0, 2)]
+
+
+def test_failed_file_ends_the_load(paths, tmp_path):
+    missing = str(tmp_path / "missing.xml")
+    with pytest.raises(OSError):
+        load_tables([paths[0], missing], workers=2)
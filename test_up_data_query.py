@@ -0,0 +1,81 @@
+import pytest
+
+from up_data import AbilityTable
+from up_data_query import QueryColumns, QuerySyntaxError, parse_query, tokenize_query
+
+
+def query_table():
+    table = AbilityTable(["num", "name", "origin", "isavailable"])
+    table.append_rows([
+        {"num": "001", "name": "Stench", "origin": "Generation III", "isavailable": "1"},
+        {"num": "091", "name": "Adaptability", "origin": "Generation IV", "isavailable": "1"},
+        {"num": "120", "name": "Reckless", "origin": "Generation IV", "isavailable": "0"},
+        {"num": "200", "name": "Mummy"},
+    ])
+    return table
+
+
+def test_tokenize_query():
+    assert tokenize_query('name contains "a \\"b\\"" and num>=5') == [
+        ("word", "name"), ("contains", "contains"), ("string", 'a "b"'),
+        ("and", "and"), ("word", "num"), ("op", ">="), ("number", 5.0)]
+
+
+def test_parse_precedence():
+    assert parse_query("a == 1 or b == 2 and not c = x") == (
+        "or",
+        ("compare", "a", "==", ("number", 1.0)),
+        ("and", ("compare", "b", "==", ("number", 2.0)), ("not", ("compare", "c", "==", ("word", "x")))))
+    assert parse_query("(a == 1 or b == 2) and c != 'y'") == (
+        "and",
+        ("or", ("compare", "a", "==", ("number", 1.0)), ("compare", "b", "==", ("number", 2.0))),
+        ("compare", "c", "!=", ("string", "y")))
+
+
+@pytest.mark.parametrize("query", [
+    "",
+    "name ==",
+    "name",
+    "== 1",
+    "name ~ 1",
+    "(name == 1",
+    "name == 1 name == 2",
+    'name == "open',
+    "name == and",
+])
+def test_syntax_errors(query):
+    with pytest.raises(QuerySyntaxError):
+        parse_query(query)
+
+
+def test_rows():
+    columns = QueryColumns(query_table())
+    assert columns.rows('origin == "Generation IV" and isavailable == 1').tolist() == [1]
+    # Numbers compare as numbers, text as text
+    assert columns.rows("num == 91").tolist() == [1]
+    assert columns.rows("num >= 100").tolist() == [2, 3]
+    assert columns.rows("name < B").tolist() == [1]
+    assert columns.rows("name contains ECK").tolist() == [2]
+    # A missing field is empty text
+    assert columns.rows('origin == ""').tolist() == [3]
+    assert columns.rows("not isavailable == 1").tolist() == [2, 3]
+
+
+def test_unknown_column():
+    with pytest.raises(QuerySyntaxError):
+        QueryColumns(query_table()).rows("colour == red")
+
+
+def test_rows_follow_edits():
+    table = query_table()
+    columns = QueryColumns(table)
+    assert columns.rows("isavailable == 0").tolist() == [2]
+    col = table.tag_index["isavailable"]
+    table.set_value(0, col, "0")
+    columns.update_row(0, col)
+    assert columns.rows("isavailable == 0").tolist() == [0, 2]
+    columns.delete_row(1)
+    table.delete_row(1)
+    assert columns.rows("isavailable == 0").tolist() == [0, 1]
+    table.append_row({"num": "300", "isavailable": "0"})
+    assert columns.rows("isavailable == 0").tolist() == [0, 1, 3]
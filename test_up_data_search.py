@@ -0,0 +1,99 @@
+import pytest
+
+from up_data import PROGRESS_EVERY, AbilityTable, write_xml
+from up_data_gen import generate_entries
+from up_data_search import NameIndex, TextIndex, load_name_index
+
+
+class Cancelled(Exception):
+    pass
+
+
+@pytest.fixture(scope="module")
+def table():
+    return AbilityTable.from_entries(generate_entries(2 * PROGRESS_EVERY + 1))
+
+
+@pytest.mark.parametrize("index_class", [TextIndex, NameIndex])
+def test_build_reports_progress(table, index_class):
+    calls = []
+    index_class(table, progress=lambda done, total: calls.append((done, total)))
+    assert calls == [(0, len(table)), (PROGRESS_EVERY, len(table)), (2 * PROGRESS_EVERY, len(table))]
+
+
+@pytest.mark.parametrize("index_class", [TextIndex, NameIndex])
+def test_build_can_be_abandoned(table, index_class):
+    def progress(done, total):
+        if done:
+            raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        index_class(table, progress=progress)
+
+
+@pytest.mark.parametrize("index_class, column", [(TextIndex, "notes"), (NameIndex, "jp_name")])
+def test_column_gained_after_build(index_class, column):
+    table = AbilityTable(["id", "name", "effect"])
+    table.append_rows([{"id": "a", "name": "Stench", "effect": "Smells"}])
+    index = index_class(table)
+    table.append_rows([{"id": "b", "name": "Drizzle", column: "あめふらし"}])
+    index.add_column(column, 1)
+    index.add_row(1)
+    assert index.search("あめふらし") == [1]
+    assert index.search(table.column("name")[0] if index_class is NameIndex else "smells") == [0]
+
+
+@pytest.mark.parametrize("query", ["Frühwecker", "Fruehwecker", "fruhweck", "FRÜH", "Straße", "strasse"])
+def test_umlauts_match_either_spelling(tmp_path, query):
+    table = AbilityTable(["id", "name", "de_name"])
+    table.append_rows([{"id": "a", "name": "Early Bird", "de_name": "Frühwecker"},
+                       {"id": "b", "name": "Big Pecks", "de_name": "Brustbieter"},
+                       {"id": "c", "name": "Straße"}])
+    expected = [2] if query.lower().startswith("stra") else [0]
+    assert NameIndex(table).search(query) == expected
+    # And from the saved index
+    path = str(tmp_path / "data.xml")
+    write_xml(table, path)
+    load_name_index(path, AbilityTable.from_file(path))
+    assert load_name_index(path, AbilityTable.from_file(path)).search(query) == expected
+
+
+def text_table():
+    table = AbilityTable(["id", "name", "effect", "notes"])
+    table.append_rows([
+        {"id": "a", "name": "Drizzle", "effect": "Summons rain when the Pokémon enters battle."},
+        {"id": "b", "name": "Rain Dish", "effect": "Restores HP in rain.", "notes": "Battle only"},
+        {"id": "c", "name": "Swift Swim", "effect": "Boosts Speed in rain, when it is raining in battle."},
+        {"id": "d", "name": "Stench", "effect": "May cause flinching."},
+    ])
+    return table
+
+
+@pytest.mark.parametrize("query, rows", [
+    ("rain", [0, 1, 2]),
+    ("RAIN battle", [0, 1, 2]),  # Every word, in any of the text columns
+    ("rain flinching", []),
+    ("drizzle", []),  # name is not a text column
+    ('"in rain"', [1, 2]),
+    ('"rain in"', []),
+    ('"when the pokémon enters"', [0]),  # Three or more words are checked in order
+    ('"the when pokémon"', []),
+    ('"in battle" speed', [2]),
+    ("", []),
+])
+def test_text_search(query, rows):
+    assert TextIndex(text_table()).search(query) == rows
+
+
+def test_text_search_follows_edits():
+    table = text_table()
+    index = TextIndex(table)
+    col = table.tag_index["effect"]
+    index.remove_row(3)
+    table.set_value(3, col, "Heavy rain.")
+    index.add_row(3)
+    assert index.search("rain") == [0, 1, 2, 3]
+    index.delete_row(0)
+    table.delete_row(0)
+    assert index.search("rain") == [0, 1, 2]
+    assert index.search('"heavy rain"') == [2]
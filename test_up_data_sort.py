@@ -0,0 +1,60 @@
+from up_data import AbilityTable
+from up_data_sort import SortKeys
+
+
+def sort_table():
+    table = AbilityTable(["num", "name", "isavailable"])
+    table.append_rows([
+        {"num": "100", "name": "Zebra", "isavailable": "1"},
+        {"num": "091", "name": "apple", "isavailable": "0"},
+        {"num": "", "name": "Éclair", "isavailable": "1"},
+        {"name": "Banana", "isavailable": "1"},
+        {"num": "7", "name": "ばなな"},
+        {"num": "91", "name": "バナナ", "isavailable": "0"},
+    ])
+    return table
+
+
+def names(table, rows):
+    return [table.column("name")[row] for row in rows]
+
+
+def test_numbers_sort_as_numbers():
+    table = sort_table()
+    keys = SortKeys(table)
+    # Empty and missing sort first, then 7 < 091 == 91 < 100, ties in row order
+    assert keys.argsort(0).tolist() == [2, 3, 4, 1, 5, 0]
+    assert keys.argsort(2).tolist() == [4, 1, 5, 0, 2, 3]
+
+
+def test_text_ignores_case_accents_and_kana():
+    table = sort_table()
+    assert names(table, SortKeys(table).argsort(1)) == ["apple", "Banana", "Éclair", "Zebra", "ばなな", "バナナ"]
+
+
+def test_descending_is_stable():
+    table = sort_table()
+    keys = SortKeys(table)
+    # Equal keys keep their row order both ways
+    assert keys.argsort(0, ascending=False).tolist() == [0, 1, 5, 4, 2, 3]
+    assert keys.argsort(2, ascending=False).tolist() == [0, 2, 3, 1, 5, 4]
+
+
+def test_sort_some_rows():
+    table = sort_table()
+    assert SortKeys(table).argsort(0, rows=[0, 1, 4]).tolist() == [4, 1, 0]
+
+
+def test_keys_follow_edits():
+    table = sort_table()
+    keys = SortKeys(table)
+    keys.argsort(1)
+    table.set_value(0, 1, "Aardvark with a name longer than every other one")
+    keys.update_row(0, 1)
+    assert names(table, keys.argsort(1))[:2] == ["Aardvark with a name longer than every other one", "apple"]
+
+    table.delete_row(1)
+    keys.delete_row(1)
+    table.append_row({"num": "1", "name": "Ant"})
+    assert names(table, keys.argsort(1))[:3] == ["Aardvark with a name longer than every other one", "Ant", "Banana"]
+    assert keys.argsort(1).tolist() == SortKeys(table).argsort(1).tolist()
@@ -0,0 +1,596 @@
+import io
+import os
+import sys
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+
+# Short cell values (origins, flags, "-" notes...) repeat across many entries
+# and are interned so every row shares one string object
+INTERN_MAX_LENGTH = 32
+PROGRESS_EVERY = 1000
+
+# Misspelt tags found in the data files and the column they belong to
+TAG_ALIASES = {
+    "pkmn_hiden": "pkmn_hidden",
+}
+
+# Columns that identify an entry. Empty values are not keys, since many
+# entries in the data files have no id yet.
+KEY_COLUMNS = ("id", "num")
+
+
+class DuplicateKeyError(ValueError):
+    def __init__(self, column, value, row):
+        super(DuplicateKeyError, self).__init__(f"{column} {value!r} is already used by entry {row}")
+        self.column = column
+        self.value = value
+        self.row = row
+
+
+def parse_xml(file_path, canonical=False):
+    tree = ET.parse(file_path)
+    root = tree.getroot()
+    if canonical:
+        strip_whitespace(root)
+    return root
+
+
+# Parse a single entry, looked up by its id (or key="num"), from the file's
+# byte-offset index instead of parsing the whole document
+def get_entry(file_path, value, key="id"):
+    from up_data_index import load_index
+    return load_index(file_path).get_entry(value, key)
+
+
+def _strip(text):
+    return (text.strip() or None) if text else None
+
+
+# Drop the indentation left in text between elements, so the layout of a saved
+# file comes from the writer alone. Text of leaf elements is data and is kept
+# as-is.
+def strip_whitespace(root):
+    for elem in root.iter():
+        if len(elem):
+            elem.text = _strip(elem.text)
+        elem.tail = _strip(elem.tail)
+
+
+def _has_text(text):
+    return bool(text) and not text.isspace()
+
+
+# Add notes on the text an element holds between its child elements, and on
+# its attributes, to the set notes
+def _element_notes(elem, notes):
+    if elem.keys():
+        notes.add(f"attributes of <{elem.tag}>")
+    if _has_text(elem.text) or any(_has_text(child.tail) for child in elem):
+        notes.add(f"text between the elements of <{elem.tag}>")
+
+
+# Add notes on what an entry holds that the column store does not keep,
+# repeated fields aside: attributes, nested elements and text between fields
+def _entry_notes(entry, notes):
+    _element_notes(entry, notes)
+    for child in entry:
+        if child.keys():
+            notes.add(f"attributes of <{child.tag}>")
+        if len(child):
+            notes.add(f"elements nested in <{child.tag}>")
+
+
+def _tail_notes(entry, container, notes):
+    if entry is not None and _has_text(entry.tail):
+        notes.add(f"text between the elements of <{container}>")
+
+
+# Stream the entries under updata/<container> one at a time. file_path can
+# also be a file opened in binary mode.
+# Each finished entry is detached from its parent before it is handed out, so
+# memory use only depends on the entries the caller keeps hold of.
+# If outside is a dict, it gets the root element's tag under "root" (as soon
+# as the root starts) and, once the file is read, under "dropped", a set of
+# notes on what the file holds besides the entries, which is not handed out:
+# other elements, attributes of the root and the container, and text between
+# their elements.
+def iter_entries(file_path, container="abilities", outside=None):
+    stack = []
+    previous = None  # The last entry, whose tail is only read once it is out
+    notes = set()
+    for event, elem in ET.iterparse(file_path, events=("start", "end")):
+        if event == "start":
+            if not stack and outside is not None:
+                outside["root"] = elem.tag  # Known before any entry is handed out
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if len(stack) == 2 and stack[1].tag == container:
+            stack[1].remove(elem)
+            if outside is not None:
+                _tail_notes(previous, container, notes)
+                previous = elem
+            yield elem
+        elif len(stack) == 1 and elem.tag == container:
+            if outside is not None:
+                _element_notes(elem, notes)
+                _tail_notes(previous, container, notes)
+                previous = None
+            # Drop anything left over in the container (e.g. comments)
+            elem.clear()
+        elif not stack and outside is not None:
+            _element_notes(elem, notes)
+            notes.update(f"<{child.tag}> elements besides <{container}>" for child in elem if child.tag != container)
+            outside["dropped"] = notes
+
+
+# Count how often each value occurs, e.g. entries per origin for the graph,
+# in one pass. Returns (unique values, counts), in order of first appearance.
+def count_values(values):
+    counts = Counter(values)
+    return list(counts), list(counts.values())
+
+
+# Value counts of table columns, each computed in one pass the first time it
+# is asked for and then kept current: call remove_row() before a row changes
+# or is deleted and add_row() once it has changed or been appended. An entry
+# without the field counts as "".
+class ValueCounts:
+    def __init__(self, table):
+        self.table = table
+        self.columns = []
+        self.counts = {}
+
+    def column_counts(self, column):
+        counts = self.counts.get(column)
+        if counts is None:
+            counts = self.counts[column] = Counter(value or "" for value in self.table.column(column))
+            self.columns.append(column)
+        return counts
+
+    # (values, counts) for the column, sorted by value so every value keeps
+    # its place however the counts were arrived at
+    def count_values(self, column):
+        counts = self.column_counts(column)
+        values = sorted(counts)
+        return values, [counts[value] for value in values]
+
+    def add_row(self, row):
+        for column in self.columns:
+            self.counts[column][self.table.column(column)[row] or ""] += 1
+
+    def remove_row(self, row):
+        for column in self.columns:
+            counts = self.counts[column]
+            value = self.table.column(column)[row] or ""
+            counts[value] -= 1
+            if counts[value] <= 0:
+                del counts[value]
+
+    def delete_row(self, row):
+        self.remove_row(row)
+
+
+def _intern(text):
+    return sys.intern(text) if len(text) <= INTERN_MAX_LENGTH else text
+
+
+# One scan over the entries for the union of their tags, in the order they are
+# first seen. Returns (columns, tag_index) where tag_index maps every tag seen,
+# aliases included, to its column.
+def infer_schema(entries):
+    columns = []
+    tag_index = {}
+    for entry in entries:
+        for child in entry:
+            if child.tag not in tag_index:
+                column = TAG_ALIASES.get(child.tag, child.tag)
+                if column not in tag_index:
+                    tag_index[column] = len(columns)
+                    columns.append(column)
+                tag_index[child.tag] = tag_index[column]
+    return columns, tag_index
+
+
+# Column store for a dataset, kept apart from ElementTree: one list per tag
+# instead of one Element per field per entry. values[col][row] holds the text
+# of that field, "" for an empty element and None where the entry has no such
+# element at all. Misspelt tags in TAG_ALIASES land in their proper column.
+# Each KEY_COLUMNS column gets a {value: row} index the first time it is
+# needed, which append_row(), set_value() and delete_row() keep up to date.
+# Anything of the file that does not fit the columns is left out, and noted
+# in dropped: writing the table over that file would lose it.
+class AbilityTable:
+    def __init__(self, columns=(), root_tag="updata", container="abilities", entry_tag="ability"):
+        self.root_tag = root_tag
+        self.container = container
+        self.entry_tag = entry_tag
+        self.columns = []
+        self.values = []
+        self.tag_index = {}
+        self.row_count = 0
+        self.keys = {}
+        # Key values the file already had more than once, per key column
+        self.duplicate_keys = {}
+        # Notes on what the file held that the table does not keep, e.g.
+        # "attributes of <name>"
+        self.dropped = set()
+        for column in columns:
+            self.add_column(column)
+
+    def __len__(self):
+        return self.row_count
+
+    # Return the column index for tag, adding a column if it is a new one
+    def add_column(self, tag):
+        i = self.tag_index.get(tag)
+        if i is not None:
+            return i
+        column = sys.intern(TAG_ALIASES.get(tag, tag))
+        i = self.tag_index.get(column)
+        if i is None:
+            i = self.tag_index[column] = len(self.columns)
+            self.columns.append(column)
+            self.values.append([None] * self.row_count)
+        self.tag_index[tag] = i
+        return i
+
+    def column(self, tag):
+        i = self.tag_index.get(tag)
+        return [None] * self.row_count if i is None else self.values[i]
+
+    # Build the {value: row} index of a key column. Files can already hold
+    # duplicates; the first row with a value keeps it.
+    def key_index(self, column):
+        keys = self.keys.get(column)
+        if keys is None:
+            column_values = self.column(column)
+            # Reversed, so the first of any duplicates is the one left in
+            keys = dict(zip(reversed(column_values), range(self.row_count - 1, -1, -1)))
+            keys.pop("", None)
+            keys.pop(None, None)
+            self.keys[column] = keys
+            if len(keys) < self.row_count - column_values.count("") - column_values.count(None):
+                self.duplicate_keys[column] = {value for row, value in enumerate(column_values)
+                                               if value and keys[value] != row}
+            else:
+                self.duplicate_keys[column] = set()
+        return keys
+
+    def build_keys(self):
+        for column in KEY_COLUMNS:
+            self.key_index(column)
+
+    # Row with the given id/num, or None
+    def find_by_id(self, value):
+        return self.key_index("id").get(value)
+
+    def find_by_num(self, value):
+        return self.key_index("num").get(value)
+
+    # Raise DuplicateKeyError if value is a key column value some other row has
+    def check_key(self, column, value, row=None):
+        if column not in KEY_COLUMNS or not value:
+            return
+        other = self.key_index(column).get(value)
+        if other is not None and other != row:
+            raise DuplicateKeyError(column, value, other)
+
+    def _add_key(self, column, value, row):
+        keys = self.keys.get(column)
+        if keys is not None and value and keys.setdefault(value, row) != row:
+            self.duplicate_keys[column].add(value)
+
+    # Call with the row still holding value
+    def _remove_key(self, column, value, row):
+        keys = self.keys.get(column)
+        if keys is None or not value:
+            return
+        if keys.get(value) != row:
+            # A later copy of a duplicate: the value stays with its row, but
+            # is no longer a duplicate once only that row is left with it
+            if value in self.duplicate_keys[column] and self.column(column).count(value) <= 2:
+                self.duplicate_keys[column].discard(value)
+            return
+        del keys[value]
+        if value in self.duplicate_keys[column]:
+            # Hand the value on to the next row that also has it
+            column_values = self.column(column)
+            others = [i for i in range(self.row_count) if i != row and column_values[i] == value]
+            if others:
+                keys[value] = others[0]
+            if len(others) <= 1:
+                self.duplicate_keys[column].discard(value)
+
+    # Fill a preallocated row from the entry's fields, then push it onto the
+    # columns in one C-level pass (deque/map), so a row costs O(fields).
+    # What does not fit the columns is only looked into, for dropped, once a
+    # quick check finds any.
+    def append_entry(self, entry):
+        tag_index = self.tag_index
+        row = [None] * len(self.columns)
+        lost = entry.keys() or _has_text(entry.text)
+        for child in entry:
+            i = tag_index.get(child.tag)
+            if i is None:
+                i = self.add_column(child.tag)
+                row.extend([None] * (len(self.columns) - len(row)))
+            if row[i] is None:  # Only the first of a repeated tag
+                row[i] = _intern(child.text or "")
+            else:
+                self.dropped.add(f"repeated <{child.tag}> fields")
+            if child.keys() or len(child):  # keys(), unlike attrib, makes no dict
+                lost = True
+            tail = child.tail
+            if tail and not tail.isspace():
+                lost = True
+        if lost:
+            _entry_notes(entry, self.dropped)
+        self._append(row)
+
+    # Add a row from a {tag: text} mapping. Raises DuplicateKeyError, before
+    # anything is added, if it reuses another entry's id or num.
+    def append_row(self, row_values):
+        for tag, value in row_values.items():
+            self.check_key(TAG_ALIASES.get(tag, tag), value)
+        row = [None] * len(self.columns)
+        for tag, value in row_values.items():
+            i = self.add_column(tag)
+            row.extend([None] * (len(self.columns) - len(row)))
+            row[i] = _intern(value or "")
+        self._append(row)
+
+    # Add many {tag: text} rows at once: keys are checked for the whole batch
+    # first (DuplicateKeyError leaves the table as it was), then each column
+    # is extended in one go. check_keys=False takes duplicates the way
+    # loading a file does, e.g. when converting a file that already has some.
+    def append_rows(self, rows, check_keys=True):
+        rows = [{TAG_ALIASES.get(tag, tag): value for tag, value in row_values.items()} for row_values in rows]
+        for column in KEY_COLUMNS if check_keys else ():
+            batch_keys = {}
+            for n, row_values in enumerate(rows):
+                value = row_values.get(column)
+                if value:
+                    self.check_key(column, value)
+                    if batch_keys.setdefault(value, n) != n:
+                        raise DuplicateKeyError(column, value, self.row_count + batch_keys[value])
+
+        start = self.row_count
+        tags = {}
+        for row_values in rows:
+            tags.update(dict.fromkeys(row_values))
+        for tag in tags:
+            self.add_column(tag)
+        for column, column_values in zip(self.columns, self.values):
+            column_values.extend(_intern(row_values[column] or "") if column in row_values else None
+                                 for row_values in rows)
+        self.row_count += len(rows)
+        for column in self.keys:
+            column_values = self.column(column)
+            for row in range(start, self.row_count):
+                self._add_key(column, column_values[row], row)
+
+    def _append(self, row):
+        deque(map(list.append, self.values, row), maxlen=0)
+        for column in self.keys:
+            self._add_key(column, row[self.tag_index[column]] if column in self.tag_index else None,
+                          self.row_count)
+        self.row_count += 1
+
+    # Change one cell, col being a column index
+    def set_value(self, row, col, value):
+        if self.values[col][row] == value:
+            return  # Also keeps a duplicated key with the row that has it
+        column = self.columns[col]
+        self.check_key(column, value, row)
+        self._remove_key(column, self.values[col][row], row)
+        self.values[col][row] = value
+        self._add_key(column, value, row)
+
+    # Remove a row; the rows after it move up by one
+    def delete_row(self, row):
+        for column in self.keys:
+            self._remove_key(column, self.column(column)[row], row)
+        for column_values in self.values:
+            del column_values[row]
+        self.row_count -= 1
+        for column, keys in self.keys.items():
+            column_values = self.column(column)
+            for i in range(row, self.row_count):
+                if keys.get(column_values[i]) == i + 1:
+                    keys[column_values[i]] = i
+
+    def row(self, i):
+        return [column_values[i] for column_values in self.values]
+
+    # Copy of the table that later edits to this one do not change
+    def copy(self):
+        table = AbilityTable(self.columns, self.root_tag, self.container, self.entry_tag)
+        table.tag_index.update(self.tag_index)
+        table.values = [list(column_values) for column_values in self.values]
+        table.row_count = self.row_count
+        table.dropped = set(self.dropped)
+        return table
+
+    # Rebuild the Element for one row, leaving out the fields it never had
+    def entry(self, i):
+        entry = ET.Element(self.entry_tag)
+        for tag, column_values in zip(self.columns, self.values):
+            value = column_values[i]
+            if value is not None:
+                ET.SubElement(entry, tag).text = value
+        return entry
+
+    def to_root(self):
+        root = ET.Element(self.root_tag)
+        container = ET.SubElement(root, self.container)
+        container.extend(self.entry(i) for i in range(self.row_count))
+        return root
+
+    @classmethod
+    def from_entries(cls, entries, **kwargs):
+        table = cls(**kwargs)
+        for entry in entries:
+            table.entry_tag = entry.tag
+            table.append_entry(entry)
+        return table
+
+    # The tree is already in memory, so the schema is inferred up front and
+    # every column is allocated at its final length before it is filled
+    @classmethod
+    def from_root(cls, root):
+        container = root[0]
+        columns, tag_index = infer_schema(container)
+        table = cls(columns, root_tag=root.tag, container=container.tag)
+        table.tag_index.update(tag_index)
+        table.row_count = len(container)
+        table.values = [[None] * table.row_count for _ in columns]
+        values = table.values
+        dropped = table.dropped
+        for row, entry in enumerate(container):
+            table.entry_tag = entry.tag
+            lost = entry.keys() or _has_text(entry.text)
+            for child in entry:
+                column_values = values[tag_index[child.tag]]
+                if column_values[row] is None:
+                    column_values[row] = _intern(child.text or "")
+                else:
+                    dropped.add(f"repeated <{child.tag}> fields")
+                if child.keys() or len(child):
+                    lost = True
+                tail = child.tail
+                if tail and not tail.isspace():
+                    lost = True
+            if lost:
+                _entry_notes(entry, dropped)
+        _element_notes(root, dropped)
+        _element_notes(container, dropped)
+        dropped.update(f"<{child.tag}> elements besides <{container.tag}>" for child in root[1:])
+        return table
+
+    # Stream a dataset file into a table without building the whole tree.
+    # progress(bytes_read, total_bytes) is called every PROGRESS_EVERY
+    # entries; it may raise to abandon the read.
+    @classmethod
+    def from_file(cls, file_path, container="abilities", progress=None):
+        table = cls(container=container)
+        outside = {}
+        with open(file_path, 'rb') as f:
+            total = os.fstat(f.fileno()).st_size
+            for entry in iter_entries(f, container, outside):
+                table.entry_tag = entry.tag
+                table.append_entry(entry)
+                if progress is not None and table.row_count % PROGRESS_EVERY == 0:
+                    progress(f.tell(), total)
+        table.root_tag = outside.get("root", table.root_tag)
+        table.dropped.update(outside.get("dropped", ()))
+        return table
+
+
+def _escape(data):
+    return data.replace("&", "&amp;").replace("<", "&lt;").replace("\"", "&quot;").replace(">", "&gt;")
+
+
+def _write_element(f, elem, indent, addindent, newl, canonical):
+    if elem.tag is ET.Comment:
+        f.write(f"{indent}<!--{elem.text}-->{newl}")
+        return
+    if elem.tag is ET.ProcessingInstruction:
+        f.write(f"{indent}<?{elem.text}?>{newl}")
+        return
+
+    f.write(indent + "<" + elem.tag)
+    for name, value in elem.items():
+        f.write(f" {name}=\"{_escape(value)}\"")
+
+    if not len(elem):
+        if elem.text:
+            f.write(f">{_escape(elem.text)}</{elem.tag}>{newl}")
+        else:
+            f.write("/>" + newl)
+        return
+
+    f.write(">" + newl)
+    child_indent = indent + addindent
+    text = _strip(elem.text) if canonical else elem.text
+    if text:
+        f.write(child_indent + _escape(text) + newl)
+    for child in elem:
+        _write_element(f, child, child_indent, addindent, newl, canonical)
+        tail = _strip(child.tail) if canonical else child.tail
+        if tail:
+            f.write(child_indent + _escape(tail) + newl)
+    f.write(f"{indent}</{elem.tag}>{newl}")
+
+
+# Write the tree as indented XML straight to an open text file in one pass.
+# The layout matches what minidom's toprettyxml() gives for the same tree.
+# With canonical=True the whitespace around text between elements is dropped, so
+# saving a file that was loaded with parse_xml(..., canonical=True) gives the
+# same bytes every time instead of indenting the old indentation again.
+# root can also be an AbilityTable, which is always written canonically.
+def write_pretty_xml(root, f, indent="  ", newl="\n", canonical=False):
+    f.write("<?xml version=\"1.0\" ?>" + newl)
+    if isinstance(root, AbilityTable):
+        _write_table(f, root, indent, newl)
+    else:
+        _write_element(f, root, "", indent, newl, canonical)
+
+
+# Same layout as writing table.to_root(), one entry Element at a time
+def _write_table(f, table, indent, newl):
+    entries = (table.entry(i) for i in range(len(table)))
+    _write_entries(f, entries, table.root_tag, table.container, indent, newl)
+
+
+def _write_entries(f, entries, root_tag, container, indent, newl):
+    f.write(f"<{root_tag}>{newl}")
+    count = 0
+    for entry in entries:
+        if not count:
+            f.write(f"{indent}<{container}>{newl}")
+        _write_element(f, entry, indent * 2, indent, newl, True)
+        count += 1
+    if not count:
+        f.write(f"{indent}<{container}/>{newl}")
+    else:
+        f.write(f"{indent}</{container}>{newl}")
+    f.write(f"</{root_tag}>{newl}")
+    return count
+
+
+# Write entries from any iterable (e.g. iter_entries or a generator) as a
+# canonical dataset file without holding them all in memory. Returns the
+# number of entries written.
+def write_entries_xml(entries, file_path, root_tag="updata", container="abilities"):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write("<?xml version=\"1.0\" ?>\n")
+        return _write_entries(f, entries, root_tag, container, "  ", "\n")
+
+
+def prettify_xml(element, canonical=False):
+    buffer = io.StringIO()
+    write_pretty_xml(element, buffer, canonical=canonical)
+    return buffer.getvalue()
+
+
+def write_xml(root, file_path, canonical=False):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        write_pretty_xml(root, f, canonical=canonical)
+
+
+# Like write_xml(), but never leaves a half-written file: the XML goes to a
+# temp file next to the target, is flushed to disk and then renamed over it
+def save_xml(root, file_path, canonical=False):
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            write_pretty_xml(root, f, canonical=canonical)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,482 @@
+import argparse
+import ast
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.dom.minidom
+import xml.etree.ElementTree as ET
+
+from up_data import (AbilityTable, ValueCounts, count_values, get_entry, iter_entries, parse_xml, prettify_xml, save_xml,
+                     write_xml)
+from up_data_cache import cache_path_for, load_table
+from up_data_diff import diff_counts
+from up_data_export import export_file
+from up_data_gen import generate_dataset
+from up_data_import import import_file
+from up_data_journal import EditJournal
+from up_data_merge import load_tables, merge_tables
+from up_data_query import QueryColumns
+from up_data_search import NameIndex, TextIndex
+from up_data_sort import SortKeys
+
+SUITE_SIZES = (1_000, 10_000, 100_000)
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+# A timing counts as a regression when it is this much slower than the
+# baseline, plus a little slack so very short timings are not just noise
+REGRESSION_FACTOR = 1.5
+REGRESSION_SLACK = 0.01
+
+# Scripts that open a window, checked by --startup
+VIEWER_MODULES = ("mew", "mew2", "mew3", "up_data_edit_tool_v1", "up_data_edit_tool_v2",
+                  "up_data_edit_tool_v3", "UltimatePokedexDataViewer")
+# Modules that must not be imported before the first window is up
+DEFERRED_IMPORTS = ("numpy", "matplotlib", "xml.dom.minidom", "uuid")
+# Seconds a viewer module may take to import, wx included
+STARTUP_BUDGET = 0.5
+
+
+# Write a copy of the source file with every entry repeated `factor` times
+def inflate_xml(src_path, dst_path, factor):
+    root = parse_xml(src_path)
+    container = root[0]
+    entries = list(container)
+    for _ in range(factor - 1):
+        container.extend(entries)
+    ET.ElementTree(root).write(dst_path, encoding="utf-8", xml_declaration=True)
+
+
+# Run func() and return (seconds, peak traced bytes)
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def count_parsed(file_path):
+    return len(parse_xml(file_path)[0])
+
+
+def count_streamed(file_path):
+    return sum(1 for _ in iter_entries(file_path))
+
+
+def bench_streaming(src_path, factors=(1, 10, 100)):
+    print("Loader peak memory (MiB) by file size")
+    streamed_peaks = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in factors:
+            path = os.path.join(tmp, f"data_x{factor}.xml")
+            inflate_xml(src_path, path, factor)
+            size = os.path.getsize(path) / 2 ** 20
+            parsed_time, parsed_peak = measure(lambda: count_parsed(path))
+            streamed_time, streamed_peak = measure(lambda: count_streamed(path))
+            print(f"  x{factor:<4} {size:8.1f} MiB file | "
+                  f"parse_xml {parsed_peak / 2 ** 20:8.2f} MiB {parsed_time:6.2f}s | "
+                  f"iter_entries {streamed_peak / 2 ** 20:6.2f} MiB {streamed_time:6.2f}s")
+            streamed_peaks.append(streamed_peak)
+
+    # The streaming loader should not grow with the file
+    return max(streamed_peaks) <= 2 * min(streamed_peaks)
+
+
+# The old ET.tostring -> minidom -> toprettyxml round-trip, kept for comparison
+def write_xml_minidom(root, file_path):
+    rough_string = ET.tostring(root, 'utf-8')
+    reparsed = xml.dom.minidom.parseString(rough_string)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(reparsed.toprettyxml(indent="  "))
+
+
+def bench_serializer(src_path, factors=(10, 100)):
+    print("Serializer time and peak memory")
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in factors:
+            path = os.path.join(tmp, f"data_x{factor}.xml")
+            inflate_xml(src_path, path, factor)
+            root = parse_xml(path)
+            old_time, old_peak = measure(lambda: write_xml_minidom(root, os.path.join(tmp, "old.xml")))
+            new_time, new_peak = measure(lambda: write_xml(root, os.path.join(tmp, "new.xml")))
+            print(f"  x{factor:<4} minidom {old_time:6.2f}s {old_peak / 2 ** 20:8.2f} MiB | "
+                  f"write_xml {new_time:6.2f}s {new_peak / 2 ** 20:8.2f} MiB")
+
+
+def bench_export(src_path, factors=(10, 100)):
+    print("Export throughput from the file (MiB of XML read per second)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in factors:
+            path = os.path.join(tmp, f"data_x{factor}.xml")
+            inflate_xml(src_path, path, factor)
+            size = os.path.getsize(path) / 2 ** 20
+            rates = []
+            for out in ("out.csv", "out.jsonl", "out.npz"):
+                seconds = timed(lambda: export_file(path, os.path.join(tmp, out)))
+                rates.append(f"{os.path.splitext(out)[1][1:]} {size / seconds:6.1f}")
+            print(f"  x{factor:<4} {size:7.1f} MiB | " + " | ".join(rates))
+
+
+# Wall-clock time to load and merge several uncached files with 1, 2, 4...
+# worker processes, up to the number of CPUs
+def bench_merge(files=4, records=50_000):
+    cpus = os.cpu_count() or 1
+    print(f"Loading and merging {files} files of {records} records ({cpus} CPUs)")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f"data_{n}.xml") for n in range(files)]
+        for n, path in enumerate(paths):
+            generate_dataset(path, records, seed=n)
+        workers = 1
+        while True:
+            for path in paths:
+                if os.path.exists(cache_path_for(path)):
+                    os.remove(cache_path_for(path))
+            tables = []
+            load_time = timed(lambda: tables.extend(load_tables(paths, workers)))
+            merge_time = timed(lambda: merge_tables(tables, names=paths))
+            print(f"  {workers:2d} workers  load {load_time:6.2f}s  merge {merge_time:6.2f}s")
+            if workers >= min(cpus, files):
+                break
+            workers = min(workers * 2, cpus, files)
+
+
+# Diff of inflated copies of the data file and of a re-laid-out copy of it:
+# time, and peak memory against the size of the files
+def bench_diff(src_path, factors=(10, 100)):
+    print("Diff time and peak memory")
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in factors:
+            old_path = os.path.join(tmp, f"old_x{factor}.xml")
+            new_path = os.path.join(tmp, f"new_x{factor}.xml")
+            inflate_xml(src_path, old_path, factor)
+            # Same entries, written in the canonical layout
+            write_xml(parse_xml(old_path, canonical=True), new_path)
+            size = os.path.getsize(old_path) / 2 ** 20
+            seconds, peak = measure(lambda: diff_counts(old_path, new_path))
+            print(f"  x{factor:<4} {size:7.1f} MiB files | {seconds:6.2f}s {peak / 2 ** 20:8.2f} MiB peak")
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_cache(src_path, records=100_000):
+    print(f"Reopen time for a {records} record file")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data_big.xml")
+        inflate_xml(src_path, path, math.ceil(records / len(parse_xml(src_path)[0])))
+        parse_time = timed(lambda: parse_xml(path))
+        first_time = timed(lambda: load_table(path))
+        reopen_time = timed(lambda: load_table(path))
+        print(f"  parse_xml {parse_time:6.2f}s | first open {first_time:6.2f}s | "
+              f"cached reopen {reopen_time:6.3f}s ({os.path.getsize(cache_path_for(path)) / 2 ** 20:.1f} MiB cache)")
+
+
+def bench_index(src_path, records=100_000):
+    print(f"Single entry lookup in a {records} record file")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data_big.xml")
+        inflate_xml(src_path, path, math.ceil(records / len(parse_xml(src_path)[0])))
+        entry_id = parse_xml(src_path)[0][-1].findtext("id")
+        parse_time = timed(lambda: next(e for e in parse_xml(path)[0] if e.findtext("id") == entry_id))
+        build_time = timed(lambda: get_entry(path, entry_id))
+        lookup_time = timed(lambda: get_entry(path, entry_id))
+        print(f"  parse_xml + scan {parse_time:6.2f}s | get_entry (building index) {build_time:6.2f}s | "
+              f"get_entry {lookup_time * 1000:6.1f}ms")
+
+
+# Bytes still allocated after building the result of func(), which is kept alive
+def retained(func):
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_table(src_path, factor=10):
+    print("Memory per record: ElementTree vs AbilityTable")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"data_x{factor}.xml")
+        inflate_xml(src_path, path, factor)
+        records = len(parse_xml(path)[0])
+        tree_size = retained(lambda: parse_xml(path))
+        table_size = retained(lambda: AbilityTable.from_file(path))
+        print(f"  {records} records | ElementTree {tree_size / records:7.0f} B/record | "
+              f"AbilityTable {table_size / records:7.0f} B/record ({tree_size / table_size:.1f}x smaller)")
+
+
+# Seconds a fresh interpreter takes to run `code`, less the bare startup
+def cold_time(code):
+    def run(source):
+        return timed(lambda: subprocess.run([sys.executable, "-c", source], check=True))
+    return min(run(code) for _ in range(3)) - min(run("pass") for _ in range(3))
+
+
+# Graph dialog: a new Figure/canvas per open (old) against one BarChart that
+# is updated in place. Drawn on the Agg canvas, so no window is needed.
+def bench_graph(categories=(9, 1000), opens=5):
+    try:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+    except ImportError:
+        print("Graph: matplotlib is not installed, skipped")
+        return
+    from up_data_graph import BarChart
+
+    print("Graph dialog")
+    import_time = cold_time("import matplotlib.figure, matplotlib.backends.backend_agg")
+    print(f"  matplotlib import {import_time:6.2f}s (now paid on the first graph instead of at startup)")
+    for count in categories:
+        values = [f"value {i}" for i in range(count)]
+        counts = [i % 97 + 1 for i in range(count)]
+
+        def new_figure():
+            figure = Figure()
+            canvas = FigureCanvasAgg(figure)
+            figure.add_subplot(111).bar(values, counts)
+            canvas.draw()
+
+        figure = Figure()
+        chart = BarChart(figure, FigureCanvasAgg(figure))
+        first_time = timed(lambda: chart.show(values, counts))
+        old_time = sum(timed(new_figure) for _ in range(opens)) / opens
+        reopen_time = sum(timed(lambda: chart.show(values, [c - 1 for c in counts])) for _ in range(opens)) / opens
+        print(f"  {count:5} bars | new figure per open {old_time:6.3f}s | first open {first_time:6.3f}s | "
+              f"reopen {reopen_time:6.3f}s")
+
+
+# Best of `repeat` runs of func(), in seconds
+def best_of(func, repeat):
+    return min(timed(func) for _ in range(repeat))
+
+
+# Time every stage of the tools on generated files of each size.
+# Returns {"stage/size": seconds}.
+def run_suite(sizes=SUITE_SIZES):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f"data_{size}.xml")
+            generate_dataset(path, size)
+            repeat = 5 if size <= 10_000 else 1
+            root = parse_xml(path)
+            table = AbilityTable.from_root(root)
+            origins = [origin or "" for origin in table.column("origin")]
+            text_index = TextIndex(table)
+            value_counts = ValueCounts(table)
+            value_counts.column_counts("origin")
+            name_index = NameIndex(table)
+            ids = table.column("id")[::max(1, size // 1000)]
+            sort_keys = SortKeys(table)
+            num_col = table.tag_index["num"]
+            name_col = table.tag_index["name"]
+            query_columns = QueryColumns(table)
+            query = 'origin == "Generation IV" and isavailable == 1 and effect contains "Flying"'
+            query_columns.rows(query)  # Factorize the columns once, as the editor does
+            journal, _ = EditJournal.open(path, table.copy())
+            table_copy = table.copy()
+            csv_path = os.path.join(tmp, f"import_{size}.csv")
+            # The records without their ids, as an import would get them
+            export_file(table, csv_path, columns=[column for column in table.columns if column != "id"])
+            stages = {
+                "parse_xml": lambda: parse_xml(path),
+                "iter_entries": lambda: count_streamed(path),
+                "prettify_xml": lambda: prettify_xml(root),
+                "write_xml": lambda: write_xml(root, os.path.join(tmp, "out.xml")),
+                "write_xml_table": lambda: write_xml(table, os.path.join(tmp, "out.xml")),
+                "save_xml_table": lambda: save_xml(table, os.path.join(tmp, "out.xml")),
+                "table_from_root": lambda: AbilityTable.from_root(root),
+                "table_from_file": lambda: AbilityTable.from_file(path),
+                "materialize_rows": lambda: [table.row(i) for i in range(len(table))],
+                "graph_counts": lambda: count_values(origins),
+                "graph_counts_cached": lambda: value_counts.count_values("origin"),
+                "text_index_build": lambda: TextIndex(table),
+                "text_search": lambda: text_index.search('sunlight "same type" rain'),
+                "name_index_build": lambda: NameIndex(table),
+                "name_search": lambda: name_index.search("sturm"),
+                "key_index_build": lambda: (table.keys.clear(), table.build_keys()),
+                "find_by_id": lambda: [table.find_by_id(value) for value in ids],
+                "sort_keys_build": lambda: (sort_keys.keys.clear(), sort_keys.column_keys(name_col)),
+                "sort_num": lambda: sort_keys.argsort(num_col, False),
+                "sort_name": lambda: sort_keys.argsort(name_col),
+                "query_first": lambda: QueryColumns(table).rows(query),
+                "query": lambda: query_columns.rows(query),
+                "journal_edit": lambda: journal.set(0, "name", "Edited"),
+                "import_csv": lambda: import_file(AbilityTable(table.columns), csv_path),
+                "export_csv": lambda: export_file(path, os.path.join(tmp, "out.csv")),
+                "export_jsonl": lambda: export_file(path, os.path.join(tmp, "out.jsonl")),
+                "export_npz": lambda: export_file(path, os.path.join(tmp, "out.npz")),
+                "merge_tables": lambda: merge_tables([table, table_copy], names=["a", "b"]),
+                "diff": lambda: diff_counts(path, table),
+            }
+            for stage, func in stages.items():
+                results[f"{stage}/{size}"] = best_of(func, repeat)
+                print(f"  {stage + '/' + str(size):<28} {results[f'{stage}/{size}']:9.4f}s", flush=True)
+            journal.close()
+    return results
+
+
+# Return the stages that got slower than the baseline
+def find_regressions(results, baseline):
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        old = baseline.get(name)
+        if old is not None and seconds > old * REGRESSION_FACTOR + REGRESSION_SLACK:
+            regressions.append((name, old, seconds))
+    return regressions
+
+
+def run_experiments(src_path):
+    ok = bench_streaming(src_path)
+    if not ok:
+        print("FAIL: iter_entries peak memory grows with file size")
+    bench_serializer(src_path)
+    bench_cache(src_path)
+    bench_index(src_path)
+    bench_table(src_path)
+    bench_graph()
+    bench_export(src_path)
+    bench_merge()
+    bench_diff(src_path)
+    return ok
+
+
+# Names imported when module_name is imported: the imports at module level
+# (not those inside functions) of it and of the local modules it imports
+def eager_imports(module_name, seen=None):
+    seen = set() if seen is None else seen
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), module_name + ".py")
+    if module_name in seen or not os.path.exists(path):
+        return seen
+    seen.add(module_name)
+    with open(path, encoding='utf-8') as f:
+        nodes = list(ast.parse(f.read()).body)
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            nodes.extend(ast.iter_child_nodes(node))
+            continue
+        for name in names:
+            eager_imports(name, seen)
+            seen.add(name)
+    return seen
+
+
+def is_deferred(name):
+    return any(name == deferred or name.startswith(deferred + ".") for deferred in DEFERRED_IMPORTS)
+
+
+# The -X importtime lines of a bare interpreter start (site, encodings...)
+def _interpreter_imports(cache=[]):
+    if not cache:
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True)
+        cache.extend(process.stderr.splitlines())
+    return cache
+
+
+# Import module_name in a fresh interpreter with -X importtime. Returns
+# (seconds, {imported module: cumulative seconds}), or None with the error
+# if it cannot be imported here (e.g. wx is not installed).
+def import_times(module_name):
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+                             cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True)
+    if process.returncode != 0:
+        return None, process.stderr.strip().splitlines()[-1]
+    times = {}
+    for line in process.stderr.splitlines()[len(_interpreter_imports()):]:
+        fields = line.split("|")
+        if line.startswith("import time:") and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1]) / 1e6
+    return times[module_name], times
+
+
+# Startup check for every viewer and the CLI: nothing in DEFERRED_IMPORTS may be imported
+# at module level, and where the module can be imported its import time
+# must fit STARTUP_BUDGET. Returns (ok, {"startup/module": seconds}).
+def bench_startup(modules=VIEWER_MODULES + ("up_data", "up_data_cli"), repeat=3):
+    print("Startup imports")
+    ok = True
+    results = {}
+    for module_name in modules:
+        eager = sorted(name for name in eager_imports(module_name) if is_deferred(name))
+        runs = [import_times(module_name) for _ in range(repeat)]
+        if runs[0][0] is None:
+            print(f"  {module_name:<28} not importable here: {runs[0][1]}")
+        else:
+            seconds, times = min(runs, key=lambda run: run[0])
+            results[f"startup/{module_name}"] = seconds
+            eager += sorted(name for name in times if is_deferred(name) and name not in eager)
+            slowest = sorted((name for name in times if name != module_name and "." not in name),
+                             key=times.get, reverse=True)[:3]
+            print(f"  {module_name:<28} {seconds:7.3f}s  (" +
+                  ", ".join(f"{name} {times[name]:.3f}s" for name in slowest) + ")")
+            if seconds > STARTUP_BUDGET:
+                print(f"FAIL: {module_name} takes {seconds:.3f}s to import, budget {STARTUP_BUDGET:.3f}s")
+                ok = False
+        if eager:
+            print(f"FAIL: {module_name} imports {', '.join(eager)} at startup")
+            ok = False
+    return ok, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dataset tools without a GUI")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SUITE_SIZES,
+                        help="record counts to generate (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run's timings as the new baseline")
+    parser.add_argument("--startup", action="store_true",
+                        help="check the import time and eager imports of the viewer scripts instead")
+    parser.add_argument("--experiments", metavar="XML_FILE", nargs="?", const="data.xml",
+                        help="run the old-vs-new comparisons on inflated copies of a data file instead")
+    args = parser.parse_args()
+
+    if args.experiments:
+        sys.exit(0 if run_experiments(args.experiments) else 1)
+
+    ok = True
+    if args.startup:
+        ok, results = bench_startup()
+    else:
+        print("Benchmark suite")
+        results = run_suite(args.sizes)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update((name, round(seconds, 4)) for name, seconds in results.items())
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    regressions = find_regressions(results, baseline)
+    for name, old, new in regressions:
+        print(f"REGRESSION: {name} took {new:.4f}s, baseline {old:.4f}s")
+    if regressions or not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import hashlib
+import os
+
+import numpy as np
+
+from up_data import AbilityTable
+
+CACHE_VERSION = 4
+
+# Neither character can appear in XML text, so they are safe to use as the
+# cell separator and the marker for a field the entry does not have
+SEPARATOR = "\0"
+MISSING = "\1"
+
+
+def cache_path_for(file_path):
+    return file_path + ".cache.npz"
+
+
+def file_hash(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Key identifying the exact contents of a dataset file, saved in a sidecar
+# written by code at `version`
+def file_key(file_path, version):
+    stat = os.stat(file_path)
+    return [str(version), str(stat.st_size), str(stat.st_mtime_ns), file_hash(file_path)]
+
+
+def key_is_current(key, file_path, version):
+    saved_version, size, mtime_ns, digest = key
+    stat = os.stat(file_path)
+    if int(saved_version) != version or int(size) != stat.st_size:
+        return False
+    # A matching mtime is trusted; otherwise fall back to the content hash
+    return int(mtime_ns) == stat.st_mtime_ns or digest == file_hash(file_path)
+
+
+# Each string column is stored as one separated UTF-8 blob, which loads back
+# with a single decode and split
+def _pack(column_values):
+    text = SEPARATOR.join(MISSING if value is None else value for value in column_values)
+    return np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+
+
+def _unpack(blob, count):
+    if count == 0:
+        return []
+    column_values = blob.tobytes().decode('utf-8').split(SEPARATOR)
+    if MISSING in column_values:
+        column_values = [None if value == MISSING else value for value in column_values]
+    return column_values
+
+
+# The table as NumPy arrays, as the cache stores it. Also how worker
+# processes send a table back, with just its columns and no key indexes.
+def pack_table(table):
+    arrays = {f"col{i}": _pack(column_values) for i, column_values in enumerate(table.values)}
+    tags = [table.root_tag, table.container, table.entry_tag]
+    return dict(tags=np.array(tags), columns=np.array(table.columns, dtype=str), count=np.array(len(table)),
+                dropped=np.array(sorted(table.dropped), dtype=str), **arrays)
+
+
+# The AbilityTable from pack_table()'s arrays, or the cache file holding them
+def unpack_table(arrays):
+    root_tag, container, entry_tag = arrays["tags"].tolist()
+    table = AbilityTable(arrays["columns"].tolist(), root_tag, container, entry_tag)
+    table.row_count = int(arrays["count"])
+    table.values = [_unpack(arrays[f"col{i}"], table.row_count) for i in range(len(table.columns))]
+    table.dropped.update(arrays["dropped"].tolist())
+    return table
+
+
+def write_cache(file_path, table):
+    key = file_key(file_path, CACHE_VERSION)
+    tmp_path = cache_path_for(file_path) + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, key=np.array(key), **pack_table(table))
+    os.replace(tmp_path, cache_path_for(file_path))
+
+
+# Return the AbilityTable saved in the sidecar cache, or None when there is no
+# cache or the XML file has changed since it was written
+def read_cache(file_path):
+    cache_path = cache_path_for(file_path)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path) as cache:
+            if not key_is_current(cache["key"].tolist(), file_path, CACHE_VERSION):
+                return None
+            table = unpack_table(cache)
+    except (OSError, ValueError, KeyError):
+        return None
+    return table
+
+
+def load_table(file_path, container="abilities", use_cache=True, progress=None):
+    if use_cache:
+        cached = read_cache(file_path)
+        if cached is not None:
+            return cached
+
+    table = AbilityTable.from_file(file_path, container, progress)
+    if use_cache:
+        try:
+            write_cache(file_path, table)
+        except OSError:
+            pass  # A read-only directory just means no cache
+    return table
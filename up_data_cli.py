@@ -0,0 +1,311 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+# No GUI toolkit here, and NumPy (cache, queries, exports) is only imported by
+# the commands that need it, so batch jobs on a headless box start quickly
+from up_data import KEY_COLUMNS, TAG_ALIASES, AbilityTable, ValueCounts, iter_entries, save_xml, write_entries_xml
+
+
+def _is_xml(file_path):
+    return os.path.splitext(file_path)[1].lower() == ".xml"
+
+
+# One error for each value of the key column used by more than one entry,
+# listing those entries. Needs table.build_keys().
+def _duplicate_key_errors(table, column):
+    duplicates = table.duplicate_keys[column]
+    if not duplicates:
+        return []
+    rows = {}
+    for row, value in enumerate(table.column(column)):
+        if value in duplicates:
+            rows.setdefault(value, []).append(row)
+    return [f"{column} {value!r} is used by entries {', '.join(map(str, value_rows))}"
+            for value, value_rows in rows.items()]
+
+
+# Problems that make a file unusable as a dataset are errors, the rest are
+# warnings. Returns (entries, errors, warnings).
+def validate_file(file_path, container="abilities"):
+    errors = []
+    warnings = []
+    try:
+        table = AbilityTable.from_file(file_path, container)
+    except ET.ParseError as e:
+        return 0, [f"not well-formed XML: {e}"], warnings
+    if len(table) == 0:
+        errors.append(f"no entries under <{container}>")
+
+    table.build_keys()
+    for column in KEY_COLUMNS:
+        missing = sum(1 for value in table.column(column) if not value)
+        if missing:
+            warnings.append(f"{missing} entries have no {column}")
+        errors.extend(_duplicate_key_errors(table, column))
+    for tag, column in TAG_ALIASES.items():
+        if tag in table.tag_index:
+            warnings.append(f"misspelt tag <{tag}>, read as <{column}> (see normalize)")
+    warnings.extend(f"{note} would be lost by saving through the editor" for note in sorted(table.dropped))
+    return len(table), errors, warnings
+
+
+# Entries with their misspelt tags corrected
+def _normalized_entries(file_path, container, outside=None):
+    for entry in iter_entries(file_path, container, outside):
+        for child in entry:
+            child.tag = TAG_ALIASES.get(child.tag, child.tag)
+        yield entry
+
+
+# Rewrite a dataset file in the canonical layout, streaming it entry by entry.
+# The new file replaces out_path only once it is completely on disk, so
+# out_path can be file_path itself. The root keeps its tag, but what the file
+# holds besides the entries is not carried over (see iter_entries; outside, if
+# a dict, gets the same notes). Rather than lose any of it, rewriting
+# file_path in place raises ValueError, unless force=True.
+def normalize_file(file_path, out_path, container="abilities", force=False, outside=None):
+    outside = {} if outside is None else outside
+    tmp_path = out_path + ".tmp"
+    try:
+        entries = _normalized_entries(file_path, container, outside)
+        first = next(entries, None)  # The root tag is known from here on
+        entries = () if first is None else itertools.chain([first], entries)
+        count = write_entries_xml(entries, tmp_path, outside.get("root", "updata"), container)
+        dropped = outside.get("dropped")
+        if dropped and not force and os.path.exists(out_path) and os.path.samefile(file_path, out_path):
+            raise ValueError(f"'{file_path}' left as it was, rewriting it would lose "
+                             f"{', '.join(sorted(dropped))} (--force rewrites it anyway)")
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+# Convert between the dataset XML and the import/export formats, by extension.
+# Entries are carried over as they are, duplicate or missing ids included;
+# validate reports those. XML to XML goes through normalize_file(), with force
+# and outside as there.
+def convert_file(in_path, out_path, columns=None, container="abilities", force=False, outside=None):
+    from up_data_export import export_file
+    from up_data_import import IMPORT_FORMATS, import_file
+
+    if os.path.splitext(in_path)[1].lower() in IMPORT_FORMATS:
+        source = AbilityTable(container=container)
+        import_file(source, in_path, check_keys=False, fill_ids=False)
+    else:
+        source = in_path
+    if not _is_xml(out_path):
+        return export_file(source, out_path, columns, container)
+    if isinstance(source, AbilityTable):
+        save_xml(source, out_path)
+        return len(source)
+    return normalize_file(source, out_path, container, force, outside)
+
+
+def _columns(text):
+    return [column.strip() for column in text.split(",") if column.strip()] if text else None
+
+
+def _write_rows(table, rows, columns, fmt, f):
+    columns = columns or table.columns
+    column_values = [table.column(column) for column in columns]
+    if fmt == "jsonl":
+        for row in rows:
+            record = {column: values[row] for column, values in zip(columns, column_values)
+                      if values[row] is not None}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        writer = csv.writer(f, delimiter="\t" if fmt == "tsv" else ",", lineterminator="\n")
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([values[row] or "" for values in column_values])
+
+
+def cmd_validate(args):
+    failed = False
+    for file_path in args.files:
+        entries, errors, warnings = validate_file(file_path, args.container)
+        print(f"{file_path}: {entries} entries, {len(errors)} errors, {len(warnings)} warnings")
+        for error in errors:
+            print(f"{file_path}: error: {error}")
+        for warning in warnings:
+            print(f"{file_path}: warning: {warning}")
+        failed = failed or bool(errors)
+    return 1 if failed else 0
+
+
+# What a rewrite did not carry over from file_path, as noted in outside
+def _print_dropped(file_path, out_path, outside):
+    for note in sorted(outside.get("dropped", ())):
+        print(f"{file_path}: warning: {note} not written to {out_path}", file=sys.stderr)
+
+
+def cmd_convert(args):
+    outside = {}
+    count = convert_file(args.input, args.output, _columns(args.columns), args.container, args.force, outside)
+    _print_dropped(args.input, args.output, outside)
+    print(f"Wrote {count} entries to {args.output}")
+    return 0
+
+
+# Exits with 1 when the files differ, like diff(1)
+def cmd_diff(args):
+    from up_data_diff import change_lines, iter_diff, key_label
+
+    counts = {"added": 0, "removed": 0, "changed": 0}
+    for kind, key, data in iter_diff(args.old, args.new, args.container, not args.exact):
+        counts[kind] += 1
+        if args.format == "jsonl":
+            field = "fields" if kind == "changed" else "record"
+            print(json.dumps({"change": kind, "key": key_label(key), field: data}, ensure_ascii=False))
+        else:
+            print("\n".join(change_lines(kind, key, data)))
+    if args.format == "text":
+        print(f"{counts['added']} added, {counts['removed']} removed, {counts['changed']} changed")
+    return 1 if any(counts.values()) else 0
+
+
+def cmd_merge(args):
+    from up_data_export import export_file
+    from up_data_merge import merge_files
+
+    table, conflicts = merge_files(args.files, args.policy, args.workers, args.container, use_cache=args.cache)
+    for value, first_path, second_path in conflicts:
+        kept = second_path if args.policy == "last" else first_path
+        print(f"id {value!r} differs in '{first_path}' and '{second_path}', kept '{kept}'", file=sys.stderr)
+    if _is_xml(args.output):
+        save_xml(table, args.output)
+    else:
+        export_file(table, args.output)
+    print(f"Wrote {len(table)} entries to {args.output}, {len(conflicts)} conflicts")
+    return 0
+
+
+def cmd_query(args):
+    from up_data_cache import load_table
+    from up_data_query import QueryColumns, QuerySyntaxError
+
+    table = load_table(args.file, args.container, use_cache=args.cache)
+    try:
+        rows = QueryColumns(table).rows(args.query).tolist()
+    except QuerySyntaxError as e:
+        print(f"Bad query: {e}", file=sys.stderr)
+        return 2
+    if args.count:
+        print(len(rows))
+    else:
+        _write_rows(table, rows, _columns(args.columns), args.format, sys.stdout)
+    return 0
+
+
+def cmd_stats(args):
+    from up_data_cache import load_table
+
+    table = load_table(args.file, args.container, use_cache=args.cache)
+    print(f"{args.file}: {len(table)} entries, {len(table.columns)} columns")
+    width = max(map(len, table.columns), default=0)
+    print(f"  {'column':<{width}}  {'filled':>8}  {'distinct':>8}")
+    for column, column_values in zip(table.columns, table.values):
+        filled = [value for value in column_values if value]
+        print(f"  {column:<{width}}  {len(filled):8d}  {len(set(filled)):8d}")
+
+    value_counts = ValueCounts(table)
+    for column in args.counts or ():
+        if column not in table.tag_index:
+            print(f"Unknown column {column!r}", file=sys.stderr)
+            return 2
+        counts = value_counts.column_counts(column)
+        print(f"{column}:")
+        for value, count in counts.most_common():
+            print(f"  {count:8d}  {value or '(empty)'}")
+    return 0
+
+
+def cmd_normalize(args):
+    for file_path in args.files:
+        out_path = args.output or file_path
+        outside = {}
+        count = normalize_file(file_path, out_path, args.container, args.force, outside)
+        _print_dropped(file_path, out_path, outside)
+        print(f"Wrote {count} entries to {out_path}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Work with updata dataset files without the GUI")
+    parser.add_argument("--container", default="abilities", help="element holding the entries")
+    force_help = "rewrite an XML file in place even if what it holds besides the entries is lost"
+    cache_help = "read and keep a .cache.npz next to each file, as the editor does, for faster loads"
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("validate", help="check files for XML errors and duplicate ids/nums")
+    command.add_argument("files", nargs="+")
+    command.set_defaults(func=cmd_validate)
+
+    command = commands.add_parser("convert", help="convert between XML, CSV, TSV, JSON Lines and .npz")
+    command.add_argument("input")
+    command.add_argument("output", help="format taken from the extension; a folder (or a path without one) for .npy files")
+    command.add_argument("--columns", help="comma-separated columns to write")
+    command.add_argument("--force", action="store_true", help=force_help)
+    command.set_defaults(func=cmd_convert)
+
+    command = commands.add_parser("diff", help="list the entries added, removed and changed, matched by id")
+    command.add_argument("old")
+    command.add_argument("new")
+    command.add_argument("--format", choices=("text", "jsonl"), default="text")
+    command.add_argument("--exact", action="store_true", help="count whitespace differences inside text too")
+    command.set_defaults(func=cmd_diff)
+
+    command = commands.add_parser("merge", help="merge files by id into one, loading them in parallel")
+    command.add_argument("files", nargs="+")
+    command.add_argument("-o", "--output", required=True, help="XML, or any format convert writes")
+    # up_data_merge.MERGE_POLICIES; that module is not imported up front, as it loads NumPy
+    command.add_argument("--policy", choices=("last", "first", "error"), default="last",
+                         help="entry kept when an id has different entries: from the last or first file, "
+                              "or stop with an error")
+    command.add_argument("--workers", type=int, help="processes to load with (default: one per file, up to the CPUs)")
+    command.add_argument("--cache", action="store_true", help=cache_help)
+    command.set_defaults(func=cmd_merge)
+
+    command = commands.add_parser("query", help="print the entries matching a filter query")
+    command.add_argument("file")
+    command.add_argument("query", help='e.g. \'origin == "Generation IV" and isavailable == 1\'')
+    command.add_argument("--columns", help="comma-separated columns to print")
+    command.add_argument("--format", choices=("csv", "tsv", "jsonl"), default="tsv")
+    command.add_argument("--count", action="store_true", help="print only the number of matches")
+    command.add_argument("--cache", action="store_true", help=cache_help)
+    command.set_defaults(func=cmd_query)
+
+    command = commands.add_parser("stats", help="count entries and the values of columns")
+    command.add_argument("file")
+    command.add_argument("--counts", nargs="+", metavar="COLUMN", help="also count the values of these columns")
+    command.add_argument("--cache", action="store_true", help=cache_help)
+    command.set_defaults(func=cmd_stats)
+
+    command = commands.add_parser("normalize", help="rewrite files in the canonical layout, fixing misspelt tags")
+    command.add_argument("files", nargs="+")
+    command.add_argument("-o", "--output", help="write here instead of over the file")
+    command.add_argument("--force", action="store_true", help=force_help)
+    command.set_defaults(func=cmd_normalize)
+
+    args = parser.parse_args(argv)
+    if args.command == "normalize" and args.output and len(args.files) > 1:
+        parser.error("--output takes a single file")
+    try:
+        return args.func(args)
+    except (OSError, ValueError, ET.ParseError) as e:
+        print(f"{args.command}: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
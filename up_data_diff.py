@@ -0,0 +1,118 @@
+import hashlib
+
+from up_data import AbilityTable
+from up_data_export import iter_records, table_records
+
+# Lines of a text diff shown before the rest is only counted
+MAX_DIFF_LINES = 1000
+
+
+# Text with its whitespace runs collapsed, so re-indented or re-wrapped text
+# compares equal; empty fields count as missing
+def _clean(record):
+    cleaned = {}
+    for column, value in record.items():
+        value = " ".join(value.split())
+        if value:
+            cleaned[column] = value
+    return cleaned
+
+
+# Fixed-size digest of a record, independent of the order of its fields.
+# XML text cannot hold \0 or \1, so they can separate the fields.
+def _digest(record):
+    text = "\1".join(column + "\0" + record[column] for column in sorted(record))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def _records(source, container):
+    if isinstance(source, AbilityTable):
+        return table_records(source)
+    return iter_records(source, container)
+
+
+# Yield (key, record) for each entry of a source, the key being its id. An
+# entry without an id is keyed by its digest, so it only matches an identical
+# entry. Repeats of a key get (key, n) so every key is unique.
+def _keyed_records(source, container, ignore_whitespace):
+    seen = {}
+    for record in _records(source, container):
+        if ignore_whitespace:
+            record = _clean(record)
+        key = record.get("id") or _digest(record)
+        n = seen.get(key, 0)
+        seen[key] = n + 1
+        yield (key if n == 0 else (key, n)), record
+
+
+def _field_changes(old, new):
+    columns = list(old) + [column for column in new if column not in old]
+    return {column: (old.get(column), new.get(column)) for column in columns
+            if old.get(column) != new.get(column)}
+
+
+# Compare two dataset files (or AbilityTables) entry by entry, matched by id,
+# yielding ("added", key, record), ("removed", key, record) and
+# ("changed", key, {column: (old text, new text)}). Both sources are
+# streamed: the old one is read once to keep a digest per entry, the new one
+# once to find what differs, and the old one again only if anything changed
+# or was removed, to fetch the old fields. Memory holds the digests and the
+# new versions of changed entries, never a whole file. With
+# ignore_whitespace, layout and spacing inside text do not count as changes.
+def iter_diff(old, new, container="abilities", ignore_whitespace=True):
+    digests = {key: _digest(record) for key, record in _keyed_records(old, container, ignore_whitespace)}
+    changed = {}
+    for key, record in _keyed_records(new, container, ignore_whitespace):
+        digest = digests.pop(key, None)
+        if digest is None:
+            yield "added", key, record
+        elif digest != _digest(record):
+            changed[key] = record
+
+    # What is left in digests was not in the new source
+    if not changed and not digests:
+        return
+    for key, record in _keyed_records(old, container, ignore_whitespace):
+        if key in digests:
+            yield "removed", key, record
+        elif key in changed:
+            yield "changed", key, _field_changes(record, changed[key])
+
+
+# Entries added, removed and changed between two sources
+def diff_counts(old, new, container="abilities", ignore_whitespace=True):
+    counts = {"added": 0, "removed": 0, "changed": 0}
+    for kind, _, _ in iter_diff(old, new, container, ignore_whitespace):
+        counts[kind] += 1
+    return counts
+
+
+def key_label(key):
+    if isinstance(key, tuple):
+        return f"{key_label(key[0])} (copy {key[1] + 1})"
+    return key if isinstance(key, str) else "(no id)"
+
+
+# Readable lines for one change from iter_diff()
+def change_lines(kind, key, data):
+    if kind == "changed":
+        return [f"~ {key_label(key)}"] + [f"    {column}: {old!r} -> {new!r}" for column, (old, new) in data.items()]
+    return [f"{'+' if kind == 'added' else '-'} {key_label(key)}  {data.get('name', '')}"]
+
+
+# Readable lines for the changes from iter_diff(), up to about max_lines of
+# them, then a summary line that counts every change
+def format_diff(changes, max_lines=MAX_DIFF_LINES):
+    lines = []
+    counts = {"added": 0, "removed": 0, "changed": 0}
+    truncated = False
+    for kind, key, data in changes:
+        counts[kind] += 1
+        if len(lines) >= max_lines:
+            truncated = True
+            continue
+        lines.extend(change_lines(kind, key, data))
+    if truncated:
+        lines.append("...")
+    lines.append(f"{counts['added']} added, {counts['removed']} removed, {counts['changed']} changed")
+    return lines
@@ -1,30 +1,14 @@
 import wx
 import wx.dataview as dv
 import xml.etree.ElementTree as ET
-import xml.dom.minidom
-import uuid
 
-
-def parse_xml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    return root
-
-
-def prettify_xml(element):
-    rough_string = ET.tostring(element, 'utf-8')
-    reparsed = xml.dom.minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="  ")
-
-
-def write_xml(root, file_path):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(prettify_xml(root))
+from up_data import infer_schema, parse_xml, write_xml
 
 
 class AddEntryDialog(wx.Dialog):
     def __init__(self, parent, columns):
         super(AddEntryDialog, self).__init__(parent, title="Add Entry", size=(450, 350))
+        import uuid
 
         self.columns = columns
         self.values = {}
@@ -105,6 +89,7 @@ class MyFrame(wx.Frame):
         self.file_path = None
         self.root = None
         self.data_container = None
+        self.columns = None
 
         # Set the frame icon
         self.set_icon()
@@ -128,18 +113,20 @@ class MyFrame(wx.Frame):
             wx.MessageBox("No data entries found in the XML file.", "Info", wx.OK | wx.ICON_INFORMATION)
             return
 
-        first_entry = self.data_container[0]
-        columns = [child.tag for child in first_entry]
+        # Columns are the union of every entry's tags, with misspelt tags
+        # mapped onto the column they belong to
+        columns, tag_index = infer_schema(self.data_container)
+        self.columns = columns
 
         for column in columns:
             self.dvlc.AppendTextColumn(column)
 
-        # Add rows to DataViewListCtrl
+        # Add rows to DataViewListCtrl, each field in its column. Reversed, so
+        # the first of a repeated tag wins, as in AbilityTable.
         for entry in self.data_container:
-            values = [child.text if child.text else "" for child in entry]
-            # Ensure the values list matches the number of columns
-            while len(values) < len(columns):
-                values.append("")
+            values = [""] * len(columns)
+            for child in reversed(entry):
+                values[tag_index[child.tag]] = child.text if child.text else ""
             self.dvlc.AppendItem(values)
 
     def on_add(self, event):
@@ -147,8 +134,7 @@ class MyFrame(wx.Frame):
             wx.MessageBox("Please open an XML file first.", "Info", wx.OK | wx.ICON_INFORMATION)
             return
 
-        first_entry = self.data_container[0]
-        columns = [child.tag for child in first_entry]
+        columns = self.columns
 
         dlg = AddEntryDialog(self, columns)
         if dlg.ShowModal() == wx.ID_OK:
@@ -172,7 +158,7 @@ class MyFrame(wx.Frame):
             # Proceed loading the file chosen by the user
             self.file_path = fileDialog.GetPath()
             try:
-                self.root = parse_xml(self.file_path)
+                self.root = parse_xml(self.file_path, canonical=True)
                 self.load_data_to_dvlc()
             except IOError:
                 wx.LogError("Cannot open file '%s'." % self.file_path)
@@ -190,7 +176,7 @@ class MyFrame(wx.Frame):
             # Save the current contents in the file
             self.file_path = fileDialog.GetPath()
             try:
-                write_xml(self.root, self.file_path)
+                write_xml(self.root, self.file_path, canonical=True)
                 wx.MessageBox("Data saved to file!", "Info", wx.OK | wx.ICON_INFORMATION)
             except IOError:
                 wx.LogError("Cannot save current data in file '%s'." % self.file_path)
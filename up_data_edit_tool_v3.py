@@ -1,33 +1,179 @@
+import os
+import threading
 import wx
 import wx.dataview as dv
-import xml.etree.ElementTree as ET
-import xml.dom.minidom
-import uuid
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
-from matplotlib.figure import Figure
 
-
-def parse_xml(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    return root
-
-
-def prettify_xml(element):
-    rough_string = ET.tostring(element, 'utf-8')
-    reparsed = xml.dom.minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent="  ")
-
-
-def write_xml(root, file_path):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(prettify_xml(root))
+# Only what the first window needs is imported here. NumPy and the modules
+# built on it (cache, indexes, sorting, queries) load with the first file,
+# matplotlib with the first graph.
+from up_data import AbilityTable, DuplicateKeyError, ValueCounts, save_xml
+
+# Autosave waits for this long without edits, so a burst of edits is saved once
+AUTOSAVE_DELAY_MS = 2000
+# ...unless the journal already holds this many edits not yet in the file
+AUTOSAVE_RECORDS = 1000
+# A save that finds an autosave still writing tries again after this long
+SAVE_RETRY_MS = 200
+# The part of the load gauge each stage of a load fills, roughly in
+# proportion to the time it takes on a large file
+LOAD_STAGES = {
+    "Reading": (0, 30),
+    "Indexing text": (30, 75),
+    "Indexing names": (75, 100),
+}
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+# Serves cells straight from the AbilityTable, so the control only asks for
+# the rows it is showing instead of holding its own copy of every cell.
+# Sorting and searching reorder or narrow a row index instead of the data.
+class AbilityListModel(dv.DataViewVirtualListModel):
+    def __init__(self, table, text_index=None, name_index=None):
+        self.table = table
+        self.text_index = text_index
+        self.name_index = name_index
+        self.indexes = [index for index in (text_index, name_index) if index is not None]
+        self.value_counts = ValueCounts(table)
+        self.indexes.append(self.value_counts)
+        # Made on the first sort/filter
+        self.sort_keys = None
+        self.query_columns = None
+        # Every edit is also written to the file's EditJournal, if it has one,
+        # and then reported to edited(), if set
+        self.journal = None
+        self.edited = None
+        self.order = list(range(len(table)))
+        super(AbilityListModel, self).__init__(len(self.order))
+
+    def GetColumnCount(self):
+        return len(self.table.columns)
+
+    def GetColumnType(self, col):
+        return "string"
+
+    def GetValueByRow(self, row, col):
+        return self.table.values[col][self.order[row]] or ""
+
+    def SetValueByRow(self, value, row, col):
+        i = self.order[row]
+        if value == (self.table.values[col][i] or ""):
+            return True  # Unchanged, even if the key is one of several rows'
+        try:
+            self.table.check_key(self.table.columns[col], value, i)
+        except DuplicateKeyError as e:
+            wx.LogError(f"Cannot change entry: {e}.")
+            return False
+        indexes = [index for index in self.indexes if self.table.columns[col] in index.columns]
+        for index in indexes:
+            index.remove_row(i)
+        self.table.set_value(i, col, value)
+        for index in indexes:
+            index.add_row(i)
+        for keys in (self.sort_keys, self.query_columns):
+            if keys is not None:
+                keys.update_row(i, col)
+        if self.journal is not None:
+            self.journal.set(i, self.table.columns[col], value)
+        self._edited()
+        return True
+
+    def _edited(self):
+        if self.edited is not None:
+            self.edited()
+
+    # Show only the given table rows, in that order
+    def show_rows(self, rows):
+        self.order = list(rows)
+        self.Reset(len(self.order))
+
+    def show_all(self):
+        self.show_rows(range(len(self.table)))
+
+    # One argsort over the column's cached sort keys; only the row index is
+    # reordered, the control just fetches the rows it shows again
+    def sort_by(self, col, ascending=True):
+        if self.sort_keys is None:
+            from up_data_sort import SortKeys
+            self.sort_keys = SortKeys(self.table)
+        rows = None if len(self.order) == len(self.table) else self.order
+        self.order = self.sort_keys.argsort(col, ascending, rows).tolist()
+        self.Reset(len(self.order))
+
+    # Raises DuplicateKeyError, leaving the table as it was, if the id or
+    # num is already taken
+    def append_row(self, row_values):
+        i = len(self.table)
+        self.table.append_row(row_values)
+        for index in self.indexes:
+            index.add_row(i)
+        self.order.append(i)
+        self.RowAppended()
+        if self.journal is not None:
+            self.journal.add(row_values)
+        self._edited()
+
+    # Append many rows, e.g. from an import, and refresh the view once.
+    # Raises DuplicateKeyError, adding none of them, if a key is taken.
+    # Returns the columns the rows added to the table.
+    def append_rows(self, rows):
+        start = len(self.table)
+        column_count = len(self.table.columns)
+        self.table.append_rows(rows)
+        new_columns = self.table.columns[column_count:]
+        if new_columns:
+            self._add_columns(new_columns, start)
+        for index in self.indexes:
+            for i in range(start, len(self.table)):
+                index.add_row(i)
+        self.order.extend(range(start, len(self.table)))
+        self.Reset(len(self.order))
+        if self.journal is not None:
+            self.journal.add_rows(rows)
+        self._edited()
+        return new_columns
+
+    # Have the search indexes cover new columns they search, before the rows
+    # that brought them in are indexed
+    def _add_columns(self, columns, rows):
+        from up_data_search import NAME_COLUMNS, TEXT_COLUMNS
+        for index, searched in ((self.text_index, TEXT_COLUMNS), (self.name_index, NAME_COLUMNS)):
+            if index is not None:
+                for column in columns:
+                    if column in searched:
+                        index.add_column(column, rows)
+
+    # Table rows matching a filter query. Raises QuerySyntaxError.
+    def filter_rows(self, query):
+        if self.query_columns is None:
+            from up_data_query import QueryColumns
+            self.query_columns = QueryColumns(self.table)
+        return self.query_columns.rows(query).tolist()
+
+    # Delete the entries shown at the given rows
+    def delete_rows(self, rows):
+        for row in sorted(rows, reverse=True):
+            i = self.order[row]
+            for index in self.indexes:
+                index.delete_row(i)
+            self.table.delete_row(i)
+            for keys in (self.sort_keys, self.query_columns):
+                if keys is not None:
+                    keys.delete_row(i)
+            if self.journal is not None:
+                self.journal.delete(i)
+            self.order = [j - (j > i) for j in self.order if j != i]
+        self.Reset(len(self.order))
+        if rows:
+            self._edited()
 
 
 class AddEntryDialog(wx.Dialog):
     def __init__(self, parent, columns):
         super(AddEntryDialog, self).__init__(parent, title="Add Entry", size=(400, 300))
+        import uuid
 
         self.columns = columns
         self.values = {}
@@ -75,28 +221,70 @@ class AddEntryDialog(wx.Dialog):
         return {column: ctrl.GetValue() for column, ctrl in self.values.items()}
 
 
+# Created on the first "Show Graph" and then kept, hidden between uses, so
+# matplotlib is only loaded once a graph is asked for and every later open
+# just updates the bars of the same figure
 class GraphDialog(wx.Dialog):
-    def __init__(self, parent, data):
+    def __init__(self, parent, value_counts, column="origin"):
         super(GraphDialog, self).__init__(parent, title="Graph Display", size=(600, 400))
 
+        from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
+        from matplotlib.figure import Figure
+        from up_data_graph import BarChart
+
+        self.value_counts = value_counts
+
         self.panel = wx.Panel(self)
         self.vbox = wx.BoxSizer(wx.VERTICAL)
 
-        # Extract data for graph
-        origins = [item['origin'] for item in data]
-        unique_origins = list(set(origins))
-        origin_counts = [origins.count(origin) for origin in unique_origins]
+        # Any column can be graphed; its counts are kept by the list model
+        self.column_choice = wx.Choice(self.panel, choices=value_counts.table.columns)
+        self.column_choice.SetStringSelection(column)
+        self.column_choice.Bind(wx.EVT_CHOICE, self.on_column_choice)
+        self.vbox.Add(self.column_choice, 0, wx.ALL, 5)
 
         # Create a figure and a canvas
         self.figure = Figure()
-        self.axes = self.figure.add_subplot(111)
-        self.axes.bar(unique_origins, origin_counts)
-
         self.canvas = FigureCanvas(self.panel, -1, self.figure)
+        self.chart = BarChart(self.figure, self.canvas)
         self.vbox.Add(self.canvas, 1, wx.EXPAND)
 
         self.panel.SetSizer(self.vbox)
         self.Layout()
+        self.draw_counts()
+
+    # Point the dialog at the counts of a newly loaded file
+    def set_value_counts(self, value_counts):
+        column = self.column_choice.GetStringSelection()
+        if value_counts.table.columns != self.column_choice.GetItems():
+            self.column_choice.Set(value_counts.table.columns)
+            if not self.column_choice.SetStringSelection(column):
+                self.column_choice.SetSelection(0)
+        self.value_counts = value_counts
+        self.draw_counts()
+
+    def draw_counts(self):
+        if self.column_choice.GetSelection() == wx.NOT_FOUND:
+            self.column_choice.SetSelection(0)
+        self.chart.show(*self.value_counts.count_values(self.column_choice.GetStringSelection()))
+
+    def on_column_choice(self, event):
+        self.draw_counts()
+
+
+# Shows the lines of a diff between the open data and another file
+class DiffDialog(wx.Dialog):
+    def __init__(self, parent, title, lines):
+        super(DiffDialog, self).__init__(parent, title=title, size=(700, 500),
+                                         style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+
+        self.vbox = wx.BoxSizer(wx.VERTICAL)
+        self.text_ctrl = wx.TextCtrl(self, value="\n".join(lines), style=wx.TE_MULTILINE | wx.TE_READONLY | wx.HSCROLL)
+        self.text_ctrl.SetFont(wx.Font(wx.FontInfo().Family(wx.FONTFAMILY_TELETYPE)))
+        self.vbox.Add(self.text_ctrl, 1, wx.EXPAND | wx.ALL, 5)
+        self.vbox.Add(self.CreateButtonSizer(wx.CLOSE), 0, wx.ALIGN_RIGHT | wx.ALL, 5)
+        self.SetSizer(self.vbox)
+        self.SetEscapeId(wx.ID_CLOSE)
 
 
 class MyFrame(wx.Frame):
@@ -106,8 +294,39 @@ class MyFrame(wx.Frame):
         self.panel = wx.Panel(self)
         self.vbox = wx.BoxSizer(wx.VERTICAL)
 
-        self.dvlc = dv.DataViewListCtrl(self.panel, style=dv.DV_ROW_LINES)
-        self.vbox.Add(self.dvlc, 1, wx.EXPAND)
+        # Full-text search over the free-text columns
+        self.search_ctrl = wx.SearchCtrl(self.panel, style=wx.TE_PROCESS_ENTER)
+        self.search_ctrl.SetDescriptiveText('Search text, e.g. sleep "same type"')
+        self.search_ctrl.ShowCancelButton(True)
+        self.search_ctrl.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self.on_search)
+        self.search_ctrl.Bind(wx.EVT_TEXT_ENTER, self.on_search)
+        self.search_ctrl.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.on_search_cancel)
+
+        # Name lookup in any language, e.g. Adaptability, anpass or てきおう
+        self.name_search_ctrl = wx.SearchCtrl(self.panel, style=wx.TE_PROCESS_ENTER)
+        self.name_search_ctrl.SetDescriptiveText("Find name (any language)")
+        self.name_search_ctrl.ShowCancelButton(True)
+        self.name_search_ctrl.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self.on_name_search)
+        self.name_search_ctrl.Bind(wx.EVT_TEXT_ENTER, self.on_name_search)
+        self.name_search_ctrl.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.on_search_cancel)
+
+        self.search_panel = wx.BoxSizer(wx.HORIZONTAL)
+        self.search_panel.Add(self.search_ctrl, 2, wx.ALL, 5)
+        self.search_panel.Add(self.name_search_ctrl, 1, wx.ALL, 5)
+        self.vbox.Add(self.search_panel, 0, wx.EXPAND)
+
+        # Column filters, see up_data_query for the syntax
+        self.filter_ctrl = wx.SearchCtrl(self.panel, style=wx.TE_PROCESS_ENTER)
+        self.filter_ctrl.SetDescriptiveText('Filter, e.g. origin == "Generation IV" and isavailable == 1')
+        self.filter_ctrl.ShowCancelButton(True)
+        self.filter_ctrl.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self.on_filter)
+        self.filter_ctrl.Bind(wx.EVT_TEXT_ENTER, self.on_filter)
+        self.filter_ctrl.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.on_search_cancel)
+        self.vbox.Add(self.filter_ctrl, 0, wx.EXPAND | wx.LEFT | wx.RIGHT | wx.BOTTOM, 5)
+
+        self.dvc = dv.DataViewCtrl(self.panel, style=dv.DV_ROW_LINES | dv.DV_MULTIPLE)
+        self.dvc.Bind(dv.EVT_DATAVIEW_COLUMN_HEADER_CLICK, self.on_column_click)
+        self.vbox.Add(self.dvc, 1, wx.EXPAND)
 
         self.panel.SetSizer(self.vbox)
 
@@ -126,16 +345,62 @@ class MyFrame(wx.Frame):
         self.add_button.Bind(wx.EVT_BUTTON, self.on_add)
         self.button_panel.Add(self.add_button, 0, wx.ALL, 5)
 
+        self.import_button = wx.Button(self.panel, label="Import")
+        self.import_button.Bind(wx.EVT_BUTTON, self.on_import)
+        self.button_panel.Add(self.import_button, 0, wx.ALL, 5)
+
+        self.export_button = wx.Button(self.panel, label="Export")
+        self.export_button.Bind(wx.EVT_BUTTON, self.on_export)
+        self.button_panel.Add(self.export_button, 0, wx.ALL, 5)
+
+        self.compare_button = wx.Button(self.panel, label="Compare")
+        self.compare_button.Bind(wx.EVT_BUTTON, self.on_compare)
+        self.button_panel.Add(self.compare_button, 0, wx.ALL, 5)
+
+        self.delete_button = wx.Button(self.panel, label="Delete Entry")
+        self.delete_button.Bind(wx.EVT_BUTTON, self.on_delete)
+        self.button_panel.Add(self.delete_button, 0, wx.ALL, 5)
+
         self.graph_button = wx.Button(self.panel, label="Show Graph")
         self.graph_button.Bind(wx.EVT_BUTTON, self.on_show_graph)
         self.button_panel.Add(self.graph_button, 0, wx.ALL, 5)
 
+        # Save to the open file once the edits pause, see on_edited(). Off
+        # until asked for, as it rewrites the file in the editor's layout.
+        self.autosave_checkbox = wx.CheckBox(self.panel, label="Autosave")
+        self.autosave_checkbox.Bind(wx.EVT_CHECKBOX, self.on_autosave_toggled)
+        self.button_panel.Add(self.autosave_checkbox, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
+        self.autosave_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_autosave_timer, self.autosave_timer)
+
+        # Progress of a file that is loading in the background
+        self.load_label = wx.StaticText(self.panel)
+        self.button_panel.Add(self.load_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
+        self.load_gauge = wx.Gauge(self.panel, range=100)
+        self.button_panel.Add(self.load_gauge, 1, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
+
+        self.cancel_load_button = wx.Button(self.panel, label="Cancel")
+        self.cancel_load_button.Bind(wx.EVT_BUTTON, self.on_cancel_load)
+        self.button_panel.Add(self.cancel_load_button, 0, wx.ALL, 5)
+
         self.vbox.Add(self.button_panel, 0, wx.EXPAND | wx.ALL, 5)
 
         self.form = None
+        self.graph_dialog = None
         self.file_path = None
-        self.root = None
-        self.data_container = None
+        self.table = None
+        self.journal = None
+        self.edit_count = 0
+        self.model = None
+        self.sort_column = None
+        self.sort_ascending = True
+
+        # Each load gets a new generation; results from older loads are dropped
+        self.load_generation = 0
+        self.load_cancel = threading.Event()
+        self.show_load_progress(False)
+
+        self.Bind(wx.EVT_CLOSE, self.on_close)
 
         # Set the frame icon
         self.set_icon()
@@ -147,28 +412,548 @@ class MyFrame(wx.Frame):
         icon = wx.Icon("icon.ico", wx.BITMAP_TYPE_ICO)
         self.SetIcon(icon)
 
-    def load_data_to_dvlc(self):
-        # Clear existing columns and items
-        self.dvlc.ClearColumns()
-        self.dvlc.DeleteAllItems()
+    def load_data_to_dvc(self, table, text_index, name_index):
+        # Clear existing columns and swap in a model over the new data
+        self.dvc.ClearColumns()
+        self.model = AbilityListModel(table, text_index, name_index)
+        self.dvc.AssociateModel(self.model)
+        self.sort_column = None
+
+        self.append_dvc_columns(table.columns)
+
+    # Show the given columns of the model, which come after those shown so far
+    def append_dvc_columns(self, columns):
+        start = self.dvc.GetColumnCount()
+        for i, column in enumerate(columns, start):
+            if column == "id":
+                self.dvc.AppendTextColumn(column, i, mode=dv.DATAVIEW_CELL_INERT)
+            else:
+                self.dvc.AppendTextColumn(column, i, mode=dv.DATAVIEW_CELL_EDITABLE)
+
+        # Auto size columns to fit content
+        for i in range(start, self.dvc.GetColumnCount()):
+            self.dvc.Columns[i].Width = wx.LIST_AUTOSIZE_USEHEADER
+
+    def clear_dvc(self):
+        self.dvc.ClearColumns()
+        self.model = AbilityListModel(AbilityTable())
+        self.dvc.AssociateModel(self.model)
+
+    def on_column_click(self, event):
+        # Sorting is done by the model; the control only shows the indicator
+        col = event.GetColumn()
+        if self.model is None or col <= 0:
+            return
+        if col == self.sort_column:
+            self.sort_ascending = not self.sort_ascending
+        else:
+            self.sort_column = col
+            self.sort_ascending = True
+        self.model.sort_by(self.dvc.Columns[col].ModelColumn, self.sort_ascending)
+        self.dvc.Columns[col].SetSortOrder(self.sort_ascending)
+
+    def show_load_progress(self, show):
+        self.load_gauge.SetValue(0)
+        self.load_label.SetLabel("")
+        self.load_label.Show(show)
+        self.load_gauge.Show(show)
+        self.cancel_load_button.Show(show)
+        self.panel.Layout()
+
+    # merge_paths loads several files, merged by id, as one dataset instead;
+    # it has no file of its own (file_path None) until it is saved
+    def start_load(self, file_path, merge_paths=None):
+        # A new Open cancels whatever is still loading
+        self.load_cancel.set()
+        self.load_cancel = threading.Event()
+        self.load_generation += 1
+
+        self.file_path = file_path
+        self.table = None
+        self.close_journal()
+        self.clear_dvc()
+        self.show_load_progress(True)
+
+        if merge_paths is None:
+            worker = threading.Thread(target=self.load_worker,
+                                      args=(file_path, self.load_generation, self.load_cancel), daemon=True)
+        else:
+            worker = threading.Thread(target=self.merge_worker,
+                                      args=(merge_paths, self.load_generation, self.load_cancel), daemon=True)
+        worker.start()
+
+    # Progress callback for one of the LOAD_STAGES of a load, for a worker
+    # thread. It raises LoadCancelled once the load is cancelled, and is
+    # called once straight away, so every stage starts with that check.
+    def stage_progress(self, generation, cancel, label):
+        start, end = LOAD_STAGES[label]
+
+        def progress(done, total):
+            if cancel.is_set():
+                raise LoadCancelled()
+            wx.CallAfter(self.on_load_progress, generation, label, start + (end - start) * done // max(total, 1))
+
+        progress(0, 1)
+        return progress
+
+    def load_worker(self, file_path, generation, cancel):
+        # Runs off the UI thread: parse the file (or read its cache) into
+        # the AbilityTable that the list model serves directly, and index it
+
+        from up_data_cache import load_table
+        from up_data_journal import EditJournal
+        from up_data_search import NameIndex, TextIndex, load_name_index
+
+        journal = None
+        try:
+            table = load_table(file_path, progress=self.stage_progress(generation, cancel, "Reading"))
+            # Bring back the edits made since the file was last written
+            try:
+                journal, replayed = EditJournal.open(file_path, table)
+            except OSError:
+                journal, replayed = None, 0  # e.g. a read-only folder; edits then live until saved
+            table.build_keys()
+            text_index = TextIndex(table, progress=self.stage_progress(generation, cancel, "Indexing text"))
+            progress = self.stage_progress(generation, cancel, "Indexing names")
+            # The saved name index is of the file as written, without the edits
+            if replayed:
+                name_index = NameIndex(table, progress=progress)
+            else:
+                name_index = load_name_index(file_path, table, progress)
+        except Exception as e:
+            if journal is not None:
+                journal.close()
+            # Any error, not just an unreadable file, has to take the progress
+            # down again
+            if not isinstance(e, LoadCancelled):
+                wx.CallAfter(self.on_load_failed, generation, file_path, e)
+            return
+
+        if not cancel.is_set():
+            wx.CallAfter(self.on_load_finished, generation, table, text_index, name_index, journal)
+        elif journal is not None:
+            journal.close()
+
+    # Load the files in worker processes and merge them; an id found in more
+    # than one file keeps the entry from the last of them
+    def merge_worker(self, file_paths, generation, cancel):
+        from up_data_merge import merge_files
+        from up_data_search import NameIndex, TextIndex
+
+        try:
+            table, conflicts = merge_files(file_paths, "last", start_method="spawn",
+                                           progress=self.stage_progress(generation, cancel, "Reading"))
+            table.build_keys()
+            text_index = TextIndex(table, progress=self.stage_progress(generation, cancel, "Indexing text"))
+            name_index = NameIndex(table, progress=self.stage_progress(generation, cancel, "Indexing names"))
+        except Exception as e:
+            if not isinstance(e, LoadCancelled):
+                wx.CallAfter(self.on_load_failed, generation, ", ".join(file_paths), e)
+            return
+
+        if not cancel.is_set():
+            wx.CallAfter(self.on_load_finished, generation, table, text_index, name_index, None, conflicts)
 
-        # Get the data container (second element) and the first data entry (third level element)
-        self.data_container = self.root[0]
+    def on_load_progress(self, generation, label, percent):
+        if generation == self.load_generation:
+            self.load_label.SetLabel(label)
+            self.load_gauge.SetValue(percent)
 
-        if len(self.data_container) == 0:
+    def on_load_finished(self, generation, table, text_index, name_index, journal, conflicts=()):
+        if generation != self.load_generation:
+            if journal is not None:
+                journal.close()
+            return
+        self.show_load_progress(False)
+
+        if len(table) == 0:
+            if journal is not None:
+                journal.close()
             wx.MessageBox("No data entries found in the XML file.", "Info", wx.OK | wx.ICON_INFORMATION)
             return
+        self.table = table
+        self.search_ctrl.ChangeValue("")
+        self.name_search_ctrl.ChangeValue("")
+        self.filter_ctrl.ChangeValue("")
+        self.load_data_to_dvc(table, text_index, name_index)
+        self.journal = journal
+        self.model.journal = journal
+        self.model.edited = self.on_edited
+        if table.dropped:
+            # Saving over the file would lose these parts; autosave waits
+            # until the user agrees to that, see confirm_dropped()
+            self.autosave_checkbox.SetValue(False)
+        if conflicts:
+            wx.MessageBox(f"{len(conflicts)} ids have different entries in the files; "
+                          "the entries from the file opened last were kept.", "Info", wx.OK | wx.ICON_INFORMATION)
+
+    def on_load_failed(self, generation, file_path, error):
+        if generation != self.load_generation:
+            return
+        self.show_load_progress(False)
+        self.file_path = None
+        wx.LogError(f"Cannot open file '{file_path}': {error}")
 
-        first_entry = self.data_container[0]
-        columns = [child.tag for child in first_entry]
+    def close_journal(self):
+        self.autosave_timer.Stop()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
 
-        for column in columns:
-            if column == "id":
-                self.dvlc.AppendTextColumn(column, mode=dv.DATAVIEW_CELL_INERT)
+    def on_cancel_load(self, event):
+        self.load_cancel.set()
+        self.load_generation += 1
+        self.file_path = None
+        self.clear_dvc()
+        self.show_load_progress(False)
+
+    def on_close(self, event):
+        self.load_cancel.set()
+        self.load_generation += 1
+        self.close_journal()
+        event.Skip()
+
+    # Every edit restarts the timer, so autosave runs once the edits pause.
+    # The edits are already safe in the journal; autosave folds them into
+    # the file. Without autosave only Save writes the file.
+    def on_edited(self):
+        self.edit_count += 1
+        if self.autosave_checkbox.IsChecked() and self.journal is not None:
+            if self.journal.records >= AUTOSAVE_RECORDS:
+                self.autosave_timer.Stop()
+                self.on_autosave_timer(None)  # e.g. a large import
+            else:
+                self.autosave_timer.StartOnce(AUTOSAVE_DELAY_MS)
+
+    def on_autosave_toggled(self, event):
+        if self.autosave_checkbox.IsChecked() and self.journal is not None \
+                and not self.confirm_dropped(self.journal.file_path):
+            self.autosave_checkbox.SetValue(False)
+
+    # Saving over the file the table was loaded from loses what the table
+    # does not keep of it (see AbilityTable.dropped), such as stray text
+    # between the fields of an entry. Returns True once the user agrees to
+    # that, which is only asked once, or if there is nothing to lose.
+    def confirm_dropped(self, path):
+        if not self.table.dropped:
+            return True
+        notes = "\n".join(f"  - {note}" for note in sorted(self.table.dropped))
+        if wx.MessageBox(f"'{path}' holds parts the editor does not keep:\n{notes}\n\n"
+                         "Saving over the file will lose them. Save over it anyway?", "Confirm",
+                         wx.YES_NO | wx.ICON_WARNING) != wx.YES:
+            return False
+        self.table.dropped.clear()
+        return True
+
+    # Compaction snapshots the table and writes it in a background thread,
+    # to a temp file that replaces the file once it is on disk, so editing
+    # goes on meanwhile and the file is never left half written
+    def on_autosave_timer(self, event):
+        journal = self.journal
+        if journal is None or not self.autosave_checkbox.IsChecked():
+            return
+        if not journal.compact(done=self.compact_done(journal)):
+            self.autosave_timer.StartOnce(AUTOSAVE_DELAY_MS)  # Still saving; try again later
+
+    # done callback for journal.compact() that reports a failure on the UI
+    # thread
+    def compact_done(self, journal):
+        def done(error):
+            wx.CallAfter(self.on_compacted, journal, error)
+        return done
+
+    def on_compacted(self, journal, error):
+        if error is not None and journal is self.journal:
+            wx.LogError(f"Cannot write the edits to '{journal.file_path}': {error}")
+
+    def on_search(self, event):
+        if self.model is None or self.model.text_index is None:
+            return
+        query = self.search_ctrl.GetValue().strip()
+        if query:
+            self.model.show_rows(self.model.text_index.search(query))
+        else:
+            self.model.show_all()
+        self.sort_column = None
+
+    def on_name_search(self, event):
+        if self.model is None or self.model.name_index is None:
+            return
+        query = self.name_search_ctrl.GetValue().strip()
+        if query:
+            self.model.show_rows(self.model.name_index.search(query))
+        else:
+            self.model.show_all()
+        self.sort_column = None
+
+    def on_filter(self, event):
+        from up_data_query import QuerySyntaxError
+
+        if self.model is None:
+            return
+        query = self.filter_ctrl.GetValue().strip()
+        if not query:
+            self.model.show_all()
+        else:
+            try:
+                self.model.show_rows(self.model.filter_rows(query))
+            except QuerySyntaxError as e:
+                wx.MessageBox(f"Invalid filter: {e}", "Error", wx.OK | wx.ICON_ERROR)
+                return
+        self.sort_column = None
+
+    def on_search_cancel(self, event):
+        self.search_ctrl.ChangeValue("")
+        self.name_search_ctrl.ChangeValue("")
+        self.filter_ctrl.ChangeValue("")
+        if self.model is not None:
+            self.model.show_all()
+        self.sort_column = None
+
+    def on_add(self, event):
+        if self.table is None:
+            wx.MessageBox("Please open an XML file first.", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+
+        dlg = AddEntryDialog(self, self.table.columns)
+        if dlg.ShowModal() == wx.ID_OK:
+            try:
+                self.model.append_row(dlg.get_values())
+            except DuplicateKeyError as e:
+                wx.MessageBox(f"Entry not added: {e}.", "Error", wx.OK | wx.ICON_ERROR)
+
+        dlg.Destroy()
+
+    # Add the records of a CSV, TSV or JSON Lines file in one batch. The file
+    # is read in the background; the rows are added when it is all read.
+    def on_import(self, event):
+        if self.table is None:
+            wx.MessageBox("Please open an XML file first.", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+
+        wildcard = "Records (*.csv;*.tsv;*.tab;*.jsonl;*.ndjson)|*.csv;*.tsv;*.tab;*.jsonl;*.ndjson"
+        with wx.FileDialog(self, "Import records", wildcard=wildcard,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = fileDialog.GetPath()
+        self.import_button.Disable()
+        threading.Thread(target=self.import_worker, args=(path, self.table, list(self.table.columns)),
+                         daemon=True).start()
+
+    def import_worker(self, path, table, columns):
+        from up_data_import import import_rows
+        rows = error = None
+        try:
+            rows = import_rows(path, columns)
+        except Exception as e:
+            error = e
+        wx.CallAfter(self.on_import_read, path, table, rows, error)
+
+    def on_import_read(self, path, table, rows, error):
+        self.import_button.Enable()
+        if table is not self.table:
+            return  # Another file was opened meanwhile
+        if error is not None:
+            wx.LogError(f"Cannot import '{path}': {error}")
+            return
+        try:
+            new_columns = self.model.append_rows(rows)
+        except DuplicateKeyError as e:
+            wx.MessageBox(f"Nothing imported: {e}.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.append_dvc_columns(new_columns)
+        wx.MessageBox(f"Imported {len(rows)} entries.", "Info", wx.OK | wx.ICON_INFORMATION)
+
+    # Write the entries as they are now, edits included, to CSV, TSV, JSON
+    # Lines or a NumPy .npz of the columns. A snapshot is written in the
+    # background.
+    def on_export(self, event):
+        if self.table is None:
+            wx.MessageBox("Please open an XML file first.", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+
+        wildcard = ("CSV files (*.csv)|*.csv|TSV files (*.tsv)|*.tsv|JSON Lines (*.jsonl)|*.jsonl|"
+                    "NumPy columns (*.npz)|*.npz")
+        with wx.FileDialog(self, "Export entries", wildcard=wildcard,
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = fileDialog.GetPath()
+        self.export_button.Disable()
+        threading.Thread(target=self.export_worker, args=(self.table.copy(), path), daemon=True).start()
+
+    def export_worker(self, snapshot, path):
+        from up_data_export import export_file
+        count = error = None
+        try:
+            count = export_file(snapshot, path)
+        except Exception as e:
+            error = e
+        wx.CallAfter(self.on_exported, path, count, error)
+
+    def on_exported(self, path, count, error):
+        self.export_button.Enable()
+        if error is not None:
+            wx.LogError(f"Cannot export to '{path}': {error}")
+        else:
+            wx.MessageBox(f"Exported {count} entries to '{path}'.", "Info", wx.OK | wx.ICON_INFORMATION)
+
+    # List what changed between another dataset file and the open data, edits
+    # included, matched by id. The diff runs on a snapshot in the background.
+    def on_compare(self, event):
+        if self.table is None:
+            wx.MessageBox("Please open an XML file first.", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+
+        with wx.FileDialog(self, "Compare with XML file", wildcard="XML files (*.xml)|*.xml",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = fileDialog.GetPath()
+        self.compare_button.Disable()
+        threading.Thread(target=self.compare_worker, args=(path, self.table.copy()), daemon=True).start()
+
+    def compare_worker(self, path, snapshot):
+        from up_data_diff import format_diff, iter_diff
+        lines = error = None
+        try:
+            lines = format_diff(iter_diff(path, snapshot, snapshot.container))
+        except Exception as e:
+            error = e
+        wx.CallAfter(self.on_compared, path, lines, error)
+
+    def on_compared(self, path, lines, error):
+        self.compare_button.Enable()
+        if error is not None:
+            wx.LogError(f"Cannot compare with '{path}': {error}")
+            return
+        dialog = DiffDialog(self, f"Changes from {os.path.basename(path)}", lines)
+        dialog.ShowModal()
+        dialog.Destroy()
+
+    def on_delete(self, event):
+        if self.model is None:
+            return
+        rows = [self.model.GetRow(item) for item in self.dvc.GetSelections()]
+        if not rows:
+            wx.MessageBox("Please select the entries to delete.", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+        if wx.MessageBox(f"Delete {len(rows)} entries?", "Confirm", wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
+            self.model.delete_rows(rows)
+
+    def on_show_graph(self, event):
+        if self.table is None:
+            wx.MessageBox("Please open an XML file first.", "Info", wx.OK | wx.ICON_INFORMATION)
+            return
+
+        if self.graph_dialog is None:
+            self.graph_dialog = GraphDialog(self, self.model.value_counts)
+        else:
+            self.graph_dialog.set_value_counts(self.model.value_counts)
+        self.graph_dialog.ShowModal()
+
+    def on_open(self, event):
+        with wx.FileDialog(self, "Open XML file", wildcard="XML files (*.xml)|*.xml",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST | wx.FD_MULTIPLE) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return  # the user changed their mind
+
+            # Proceed loading the file chosen by the user in the background;
+            # several files are merged into one dataset
+            paths = fileDialog.GetPaths()
+            if len(paths) == 1:
+                self.start_load(paths[0])
             else:
-                self.dvlc.AppendTextColumn(column, mode=dv.DATAVIEW_CELL_EDITABLE)
+                self.start_load(None, paths)
+
+    def on_save(self, event):
+        if self.table is None:
+            wx.LogError("No file is currently open.")
+            return
 
-        # Add rows to DataViewListCtrl
-        for entry in self.data_container:
-            values = {child.tag: child.text if child.text else "" for child in entry}
-            # Ensure the values list matches
+        with wx.FileDialog(self, "Save XML file", wildcard="XML files (*.xml)|*.xml",
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return  # the user changed their mind
+
+            # Save the current contents in the file, in the background.
+            # Saving over the open file folds its journal into it; saving
+            # elsewhere writes a snapshot and starts a journal for the new file.
+            path = fileDialog.GetPath()
+            same_file = self.file_path is not None and os.path.abspath(path) == os.path.abspath(self.file_path)
+            if same_file and not self.confirm_dropped(path):
+                return
+            if same_file and self.journal is not None:
+                self.autosave_timer.Stop()
+                self.save_in_place(self.journal, path)
+            else:
+                self.save_button.Disable()
+                snapshot = self.table.copy()
+                threading.Thread(target=self.save_worker, args=(snapshot, path, self.table, self.edit_count),
+                                 daemon=True).start()
+
+    # Compaction takes its snapshot here, on the UI thread, so it holds exactly
+    # the edits the journal has so far; only the writing runs in the background
+    def save_in_place(self, journal, path):
+        if journal is not self.journal:
+            return  # Another file was opened meanwhile
+
+        def done(error):
+            wx.CallAfter(self.on_saved, path, error)
+
+        if not journal.compact(done=done):
+            wx.CallLater(SAVE_RETRY_MS, self.save_in_place, journal, path)  # Still autosaving
+
+    # Write the snapshot and hash the new file for its journal; the journal
+    # itself is started by on_saved_as(), on the UI thread
+    def save_worker(self, snapshot, path, table, edit_count):
+        from up_data_cache import file_key
+        from up_data_journal import JOURNAL_VERSION
+        key = error = None
+        try:
+            save_xml(snapshot, path, canonical=True)
+            key = file_key(path, JOURNAL_VERSION)
+        except Exception as e:
+            error = e
+        wx.CallAfter(self.on_saved_as, path, table, edit_count, key, error)
+
+    def on_saved(self, path, error):
+        if error is not None:
+            wx.LogError(f"Cannot save current data in file '{path}': {error}")
+        else:
+            wx.MessageBox("Data saved to file!", "Info", wx.OK | wx.ICON_INFORMATION)
+
+    # Switch to the file saved by save_worker() with a new, empty journal.
+    # The file was just written from the table, so no old journal for that
+    # path is replayed.
+    def on_saved_as(self, path, table, edit_count, key, error):
+        from up_data_journal import EditJournal
+
+        self.save_button.Enable()
+        if table is not self.table:
+            return  # Another file was opened meanwhile
+        if error is None:
+            self.close_journal()
+            try:
+                self.journal = EditJournal.create(path, table, key)
+            except OSError:
+                self.journal = None  # e.g. a read-only folder; edits then live until saved
+            self.model.journal = self.journal
+            self.file_path = path
+            # The new file holds just what the table does
+            table.dropped.clear()
+            if self.edit_count != edit_count and self.journal is not None:
+                # Edits made while saving are not in the file yet
+                self.journal.compact(done=self.compact_done(self.journal))
+        self.on_saved(path, error)
+
+
+def main():
+    app = wx.App(False)
+    frame = MyFrame(None, "Ultimate Pokedex Data Editing Tool (Python ver.)")
+    app.MainLoop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+
+from up_data import TAG_ALIASES, AbilityTable, iter_entries
+
+# File extensions and the format written to them. A path without an
+# extension, or an existing folder, is taken as a folder to hold one .npy file
+# per column.
+EXPORT_FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".npz": "npz",
+}
+
+
+# Columns are spilled to temp files and written out in pieces of about this
+# many bytes of text
+COLUMN_CHUNK_BYTES = 1 << 20
+
+
+# Raises ValueError for an extension that is none of EXPORT_FORMATS
+def export_format(out_path):
+    extension = os.path.splitext(out_path)[1].lower()
+    if extension in EXPORT_FORMATS:
+        return EXPORT_FORMATS[extension]
+    if not extension or os.path.isdir(out_path):
+        return "npy"
+    raise ValueError(f"Cannot export to '{out_path}': unknown extension {extension!r}, expected one of "
+                     f"{', '.join(EXPORT_FORMATS)} or a folder")
+
+
+# Yield each entry of a dataset file as a {column: text} dict, one at a time,
+# from a streaming parse. Fields keep the file's order; the first of a
+# repeated tag wins, as in AbilityTable.
+def iter_records(file_path, container="abilities"):
+    for entry in iter_entries(file_path, container):
+        record = {}
+        for child in entry:
+            record.setdefault(TAG_ALIASES.get(child.tag, child.tag), child.text or "")
+        yield record
+
+
+def table_records(table):
+    columns = table.columns
+    for row in zip(*table.values):
+        yield {column: value for column, value in zip(columns, row) if value is not None}
+
+
+# Write records as CSV (or TSV) with the given columns. Fields missing from a
+# record are written empty; fields of other columns are left out.
+def write_csv(records, out_path, columns, delimiter=","):
+    count = 0
+    with open(out_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(columns)
+        for record in records:
+            writer.writerow([record.get(column, "") for column in columns])
+            count += 1
+    return count
+
+
+# Write records as CSV when the columns are not known up front, in one pass:
+# rows go to a temp file with the columns seen so far, and the header is
+# written in front of them at the end. Rows written before a column first
+# appeared are padded then, which is only needed if the first record did not
+# have every field.
+def write_csv_streamed(records, out_path, delimiter=","):
+    columns = []
+    seen = set()
+    count = 0
+    padded_rows = 0  # Rows written before the last new column appeared
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, 'w+', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        for record in records:
+            if not seen.issuperset(record):
+                new_columns = [column for column in record if column not in seen]
+                columns.extend(new_columns)
+                seen.update(new_columns)
+                padded_rows = count
+            writer.writerow([record.get(column, "") for column in columns])
+            count += 1
+
+        f.seek(0)
+        with open(out_path, 'w', encoding='utf-8', newline='') as out:
+            csv.writer(out, delimiter=delimiter).writerow(columns)
+            if padded_rows:
+                reader = csv.reader(f, delimiter=delimiter)
+                writer = csv.writer(out, delimiter=delimiter)
+                for row in reader:
+                    writer.writerow(row + [""] * (len(columns) - len(row)))
+            else:
+                shutil.copyfileobj(f, out)
+    os.remove(tmp_path)
+    return count
+
+
+def write_jsonl(records, out_path, columns=None):
+    count = 0
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            if columns is not None:
+                record = {column: record[column] for column in columns if column in record}
+            f.write(dumps(record))
+            f.write("\n")
+            count += 1
+    return count
+
+
+# One column's values as they were spilled, each followed by "\0" (which XML
+# text cannot hold), in lists of about COLUMN_CHUNK_BYTES
+def _read_spilled(f):
+    rest = b""
+    for block in iter(lambda: f.read(COLUMN_CHUNK_BYTES), b""):
+        chunk = rest + block
+        end = chunk.rfind(b"\0")
+        if end < 0:
+            rest = chunk
+            continue
+        rest = chunk[end + 1:]
+        yield chunk[:end].decode('utf-8').split("\0")
+
+
+# Write a spilled column to an open file as a .npy string array of the given
+# width, one piece at a time
+def _write_npy(f, spill_path, count, width):
+    dtype = np.dtype(f"<U{max(width, 1)}")
+    header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (count,)}
+    np.lib.format.write_array_header_1_0(f, header)
+    with open(spill_path, 'rb') as spill:
+        for column_values in _read_spilled(spill):
+            f.write(np.array(column_values, dtype=dtype).tobytes())
+
+
+# Write records as one string array per column, "" where an entry has no such
+# field, as a single .npz archive or as <column>.npy files in the out_path
+# folder. A string array is as wide as its longest value, so each column is
+# first spilled to a temp file, which also finds that width, and then written
+# out piece by piece: memory use does not grow with the number of records.
+# columns defaults to every field, in order of first appearance.
+def write_columns(records, out_path, columns=None, fmt="npz"):
+    count = 0
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(out_path))) as tmp:
+        spills = {}
+        widths = {}
+
+        def spill(column):
+            spills[column] = open(os.path.join(tmp, f"{len(spills)}.txt"), 'w', encoding='utf-8', newline='')
+            spills[column].write("\0" * count)  # Rows before the column first appeared
+            widths[column] = 0
+
+        try:
+            for column in columns or ():
+                spill(column)
+            for record in records:
+                for column, value in record.items():
+                    if column not in spills:
+                        if columns is not None:
+                            continue
+                        spill(column)
+                    spills[column].write(value)
+                    if len(value) > widths[column]:
+                        widths[column] = len(value)
+                count += 1
+                for column, f in spills.items():
+                    f.write("\0")
+        finally:
+            for f in spills.values():
+                f.close()
+
+        spill_paths = {column: f.name for column, f in spills.items()}
+        _write_spilled(spill_paths, widths, count, out_path, fmt)
+    return count
+
+
+def _write_spilled(spill_paths, widths, count, out_path, fmt):
+    if fmt == "npz":
+        with zipfile.ZipFile(out_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for column, spill_path in spill_paths.items():
+                with archive.open(column + ".npy", 'w', force_zip64=True) as out:
+                    _write_npy(out, spill_path, count, widths[column])
+    else:
+        os.makedirs(out_path, exist_ok=True)
+        for column, spill_path in spill_paths.items():
+            with open(os.path.join(out_path, column + ".npy"), 'wb') as out:
+                _write_npy(out, spill_path, count, widths[column])
+
+
+# Export a dataset file, or an AbilityTable, in the format given by out_path's
+# extension (see export_format()). A file is read with a streaming parse,
+# never as a whole tree. Returns the number of entries written.
+def export_file(source, out_path, columns=None, container="abilities", fmt=None):
+    fmt = fmt or export_format(out_path)
+    if isinstance(source, AbilityTable):
+        records = table_records(source)
+        if columns is None and fmt != "jsonl":
+            columns = source.columns
+    else:
+        records = iter_records(source, container)
+
+    if fmt in ("csv", "tsv"):
+        delimiter = "\t" if fmt == "tsv" else ","
+        if columns is None:
+            return write_csv_streamed(records, out_path, delimiter)
+        return write_csv(records, out_path, columns, delimiter)
+    if fmt == "jsonl":
+        return write_jsonl(records, out_path, columns)
+    return write_columns(records, out_path, columns, fmt)
@@ -0,0 +1,87 @@
+import argparse
+import random
+import uuid
+import xml.etree.ElementTree as ET
+
+from up_data import write_entries_xml
+
+ORIGINS = ["Generation I", "Generation II", "Generation III", "Generation IV", "Generation V",
+           "Generation VI", "Generation VII", "Generation VIII", "Generation IX"]
+NAME_SYLLABLES = ["ad", "ap", "aer", "il", "ate", "bat", "tle", "ar", "mor", "flash", "fire", "blaze",
+                  "leaf", "guard", "chlo", "ro", "phyll", "drou", "ght", "sand", "storm", "swift",
+                  "swim", "lev", "it", "ate", "in", "tim", "id", "ate", "pres", "sure", "stat", "ic"]
+GERMAN_SYLLABLES = ["an", "pass", "ung", "ze", "nit", "haut", "kampf", "pan", "zer", "feuer", "blatt",
+                    "schutz", "dür", "re", "sand", "sturm", "wasser", "schwe", "be", "ein", "schüch",
+                    "ter", "druck", "stat", "ik", "ö", "ä", "ü", "ß", "kraft", "fluch", "körper"]
+HIRAGANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをんがぎぐげござじずぜぞだぢづでどばびぶべぼぱぴぷぺぽょゅゃっ"
+KATAKANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワヲンガギグゲゴザジズゼゾダヂヅデドバビブベボパピプペポョュャッー"
+WORDS = ["the", "Pokémon", "moves", "power", "of", "type", "same", "boosts", "raises", "lowers", "when",
+         "in", "battle", "opposing", "ally", "attack", "defense", "speed", "accuracy", "evasion", "weather",
+         "sunlight", "rain", "sandstorm", "hail", "status", "condition", "prevents", "switching", "turn",
+         "each", "HP", "restores", "damage", "critical", "hit", "Flying-type", "Normal-type", "Fire-type",
+         "Water-type", "becomes", "contact", "chance", "30%", "a", "little", "sharply", "held", "item"]
+FIELD_EFFECTS = ["This ability has no out-of-battle effect.",
+                 "Increases the chance of encountering wild Pokémon.",
+                 "Halves the chance of encountering wild Pokémon.",
+                 "Eggs in the party hatch faster."]
+
+
+def _name(rng, syllables, low=2, high=4):
+    return "".join(rng.choice(syllables) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def _japanese(rng):
+    alphabet = HIRAGANA if rng.random() < 0.4 else KATAKANA
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 8)))
+
+
+def _sentences(rng, low, high):
+    sentences = []
+    for _ in range(rng.randint(low, high)):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 18))]
+        sentence = " ".join(words)
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+    return " ".join(sentences)
+
+
+# Yield `records` synthetic ability entries shaped like the ones in data.xml.
+# The same seed always gives the same data.
+def generate_entries(records, seed=0):
+    rng = random.Random(seed)
+    for n in range(records):
+        entry = ET.Element("ability")
+        fields = [
+            ("id", str(uuid.UUID(int=rng.getrandbits(128), version=4))),
+            ("num", f"{n + 1:03d}"),
+            ("name", _name(rng, NAME_SYLLABLES)),
+            ("de_name", _name(rng, GERMAN_SYLLABLES)),
+            ("jp_name", _japanese(rng)),
+            ("gametext", _sentences(rng, 1, 3)),
+            ("effect", _sentences(rng, 1, 4)),
+            ("pkmn_canhave", ""),
+            ("pkmn_hidden", ""),
+            ("fieldeffect", rng.choice(FIELD_EFFECTS)),
+            ("isavailable", "1" if rng.random() < 0.9 else "0"),
+            ("notes", "-" if rng.random() < 0.8 else _sentences(rng, 1, 1)),
+            ("origin", rng.choice(ORIGINS)),
+        ]
+        for tag, text in fields:
+            ET.SubElement(entry, tag).text = text
+        yield entry
+
+
+def generate_dataset(file_path, records, seed=0):
+    write_entries_xml(generate_entries(records, seed), file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic updata/abilities dataset file")
+    parser.add_argument("file_path")
+    parser.add_argument("records", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_dataset(args.file_path, args.records, args.seed)
+
+
+if __name__ == "__main__":
+    main()
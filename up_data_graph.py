@@ -0,0 +1,55 @@
+# Bars past this many lose their tick labels, which would only overlap
+MAX_LABELLED_BARS = 40
+# Room left above the tallest bar, so that small changes in the counts keep
+# the axes as they are and only the bars have to be redrawn
+HEADROOM = 1.1
+
+
+# Bar chart of value counts on a figure and canvas that are kept for the life
+# of the window. Showing the same categories again only changes the heights
+# of the existing bars and blits them over a saved background of the axes;
+# the whole figure is drawn only when the categories or the y axis change.
+class BarChart:
+    def __init__(self, figure, canvas):
+        self.figure = figure
+        self.canvas = canvas
+        self.axes = figure.add_subplot(111)
+        figure.subplots_adjust(bottom=0.25)  # Room for the slanted labels
+        self.values = None
+        self.bars = []
+        self.background = None
+        canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        # The bars are animated, so a full draw leaves them out: save the
+        # empty axes to restore before blitting, then draw the bars on top
+        self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+        self._draw_bars()
+
+    def _draw_bars(self):
+        for bar in self.bars:
+            self.axes.draw_artist(bar)
+
+    def show(self, values, counts):
+        values = list(values)
+        top = max(counts, default=0)
+        if values == self.values and self.background is not None and top <= self.axes.get_ylim()[1]:
+            for bar, count in zip(self.bars, counts):
+                bar.set_height(count)
+            self.canvas.restore_region(self.background)
+            self._draw_bars()
+            self.canvas.blit(self.axes.bbox)
+            return
+
+        self.values = values
+        self.axes.clear()
+        positions = range(len(values))
+        self.bars = list(self.axes.bar(positions, counts, animated=True))
+        if len(values) <= MAX_LABELLED_BARS:
+            self.axes.set_xticks(positions, values, rotation=30, ha="right")
+        else:
+            self.axes.set_xticks([])
+            self.axes.set_xlabel(f"{len(values)} values")
+        self.axes.set_ylim(0, max(1, top * HEADROOM))
+        self.background = None
+        self.canvas.draw()
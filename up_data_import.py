@@ -0,0 +1,139 @@
+import csv
+import json
+import os
+import re
+import uuid
+
+from up_data import TAG_ALIASES
+
+# File extensions and the format read from them
+IMPORT_FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".tab": "tsv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+_TAG_RE = re.compile(r"[A-Za-z_][\w.-]*$")
+_SEPARATORS_RE = re.compile(r"[\s_-]+")
+
+
+class RecordImportError(ValueError):
+    pass
+
+
+def import_format(file_path):
+    fmt = IMPORT_FORMATS.get(os.path.splitext(file_path)[1].lower())
+    if fmt is None:
+        raise RecordImportError(f"Cannot import '{file_path}': expected one of {', '.join(IMPORT_FORMATS)}")
+    return fmt
+
+
+# Yield (line number, {field: value}) for each record of a CSV, TSV or JSON
+# Lines file, one at a time
+def read_records(file_path, fmt=None):
+    fmt = fmt or import_format(file_path)
+    if fmt == "jsonl":
+        with open(file_path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise RecordImportError(f"Line {line_number}: {e}")
+                if not isinstance(record, dict):
+                    raise RecordImportError(f"Line {line_number}: expected a JSON object")
+                yield line_number, record
+    else:
+        # utf-8-sig drops the byte order mark spreadsheets like to write
+        with open(file_path, encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f, delimiter="\t" if fmt == "tsv" else ",")
+            for record in reader:
+                if None in record:
+                    raise RecordImportError(f"Line {reader.line_num}: more fields than the header has")
+                yield reader.line_num, record
+
+
+# Field names are matched to columns ignoring case, spaces, "_" and "-", so
+# "DE Name" fills de_name
+def _name_key(name):
+    return _SEPARATORS_RE.sub("", name).casefold()
+
+
+# Maps the field names of an imported file onto the columns of a table.
+# Fields matching no column become new columns, if they are valid tags.
+class ColumnMapping:
+    def __init__(self, columns):
+        self.columns = {}
+        for column in columns:
+            self.columns.setdefault(_name_key(column), column)
+        for tag, column in TAG_ALIASES.items():
+            self.columns.setdefault(_name_key(tag), column)
+        self.mapping = {}
+        self.fields = {}
+
+    def column(self, name):
+        column = self.mapping.get(name)
+        if column is not None:
+            return column
+        key = _name_key(name)
+        column = self.columns.get(key)
+        if column is None:
+            column = name.strip()
+            if not _TAG_RE.match(column) or column.lower().startswith("xml"):
+                raise RecordImportError(f"Field {name!r} is not a valid column name")
+            self.columns[key] = column
+        other = self.fields.setdefault(column, name)
+        if other != name:
+            raise RecordImportError(f"Fields {other!r} and {name!r} both map to column {column!r}")
+        self.mapping[name] = column
+        return column
+
+
+def _text(value, line_number):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "1" if value else "0"  # As isavailable holds them
+    if isinstance(value, (int, float)):
+        return str(value)
+    raise RecordImportError(f"Line {line_number}: expected text or a number, not {value!r}")
+
+
+# Random (version 4) UUIDs from one read of the system's random source
+def new_ids(count):
+    data = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=data[i:i + 16], version=4)) for i in range(0, len(data), 16)]
+
+
+# Read a CSV, TSV or JSON Lines file into {column: text} rows for
+# AbilityTable.append_rows(), mapping its fields onto columns. Empty fields
+# are kept as "" (JSON nulls are left out), and rows without an id are given a
+# new one unless fill_ids=False.
+def import_rows(file_path, columns, fmt=None, fill_ids=True):
+    mapping = ColumnMapping(columns)
+    column_for = mapping.column
+    rows = []
+    for line_number, record in read_records(file_path, fmt):
+        row_values = {}
+        for name, value in record.items():
+            text = _text(value, line_number)
+            if text is not None:
+                row_values[column_for(name)] = text
+        rows.append(row_values)
+
+    missing = [row_values for row_values in rows if not row_values.get("id")] if fill_ids else []
+    for row_values, new_id in zip(missing, new_ids(len(missing))):
+        row_values["id"] = new_id
+    return rows
+
+
+# Append the records of a file to table in one batch. Returns the number of
+# rows added. Raises RecordImportError, or DuplicateKeyError if a record
+# reuses an id or num (unless check_keys=False), with the table left as it was.
+def import_file(table, file_path, fmt=None, check_keys=True, fill_ids=True):
+    rows = import_rows(file_path, table.columns, fmt, fill_ids)
+    table.append_rows(rows, check_keys)
+    return len(rows)
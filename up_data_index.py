@@ -0,0 +1,169 @@
+import hashlib
+import mmap
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+INDEX_VERSION = 2
+
+
+def index_path_for(file_path):
+    return file_path + ".index.npz"
+
+
+def _update_hash(digest, f, start, end):
+    f.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = f.read(min(remaining, 1 << 20))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+
+
+def _field(mm, start, end, tag):
+    open_tag = b"<" + tag + b">"
+    s = mm.find(open_tag, start, end)
+    if s < 0:
+        return ""
+    s += len(open_tag)
+    e = mm.find(b"</" + tag + b">", s, end)
+    if e < 0:
+        return ""
+    raw = mm[s:e]
+    if b"&" in raw or b"<" in raw:
+        # Entity or character references, or CDATA: let the parser read them
+        try:
+            return (ET.fromstring(b"<x>" + raw + b"</x>").text or "").strip()
+        except ET.ParseError:
+            pass
+    return raw.decode('utf-8').strip()
+
+
+# Find the byte range of every <tag>...</tag> record from offset `pos` onwards
+def scan_records(mm, pos=0, tag=b"ability"):
+    open_tag = b"<" + tag
+    close_tag = b"</" + tag + b">"
+    while True:
+        start = mm.find(open_tag, pos)
+        if start < 0:
+            return
+        after = mm[start + len(open_tag):start + len(open_tag) + 1]
+        if after not in (b">", b" ", b"\t", b"\r", b"\n"):
+            pos = start + 1  # A longer tag that only shares the prefix
+            continue
+        end = mm.find(close_tag, start)
+        if end < 0:
+            return
+        end += len(close_tag)
+        yield start, end
+        pos = end
+
+
+# Byte offsets of every entry in a dataset file, so single entries can be
+# parsed from their slice of the file instead of parsing the whole document
+class RecordIndex:
+    def __init__(self, file_path, starts, ends, ids, nums):
+        self.file_path = file_path
+        self.starts = starts
+        self.ends = ends
+        self.ids = ids
+        self.nums = nums
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def position(self, value, key="id"):
+        positions = self._positions.get(key)
+        if positions is None:
+            keys = self.ids if key == "id" else self.nums
+            positions = {}
+            for i, k in enumerate(keys):
+                if k:  # An entry without the field has no key, as in AbilityTable
+                    positions.setdefault(k, i)
+            self._positions[key] = positions
+        return positions.get(value)
+
+    def read_entry(self, i):
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.starts[i])
+            return ET.fromstring(f.read(self.ends[i] - self.starts[i]))
+
+    def get_entry(self, value, key="id"):
+        i = self.position(value, key)
+        return None if i is None else self.read_entry(i)
+
+    def save(self, size, mtime_ns, digest):
+        key = [str(INDEX_VERSION), str(size), str(mtime_ns), digest]
+        tmp_path = index_path_for(self.file_path) + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, key=np.array(key),
+                     starts=np.array(self.starts, dtype=np.int64), ends=np.array(self.ends, dtype=np.int64),
+                     ids=np.array(self.ids, dtype=str), nums=np.array(self.nums, dtype=str))
+        os.replace(tmp_path, index_path_for(self.file_path))
+
+
+def _read_saved_index(file_path):
+    try:
+        with np.load(index_path_for(file_path)) as saved:
+            version, size, mtime_ns, digest = saved["key"].tolist()
+            if int(version) != INDEX_VERSION:
+                return None
+            index = RecordIndex(file_path, saved["starts"].tolist(), saved["ends"].tolist(),
+                                saved["ids"].tolist(), saved["nums"].tolist())
+            return index, int(size), int(mtime_ns), digest
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# The saved index and the offset to scan on from, if the file is unchanged up
+# to its last indexed record (the saved digest covers that much), or a new
+# index and offset 0. Also returns the hash of the file up to the offset.
+def _resume(file_path, f, saved, size):
+    prefix_hash = hashlib.sha1()
+    if saved is not None:
+        index, _, _, digest = saved
+        if index.ends and size >= index.ends[-1]:
+            _update_hash(prefix_hash, f, 0, index.ends[-1])
+            if prefix_hash.hexdigest() == digest:
+                return index, index.ends[-1], prefix_hash
+    return RecordIndex(file_path, [], [], [], []), 0, hashlib.sha1()
+
+
+# Load the persisted index for file_path, bringing it up to date first.
+# An unchanged file is used as-is. If the bytes up to the last indexed record
+# are unchanged (entries were appended) only the rest of the file is scanned.
+# Anything else rebuilds the index from scratch.
+def load_index(file_path, tag="ability", persist=True):
+    stat = os.stat(file_path)
+    saved = _read_saved_index(file_path)
+    if saved is not None:
+        index, size, mtime_ns, digest = saved
+        if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+            return index
+
+    tag = tag.encode('utf-8')
+    with open(file_path, 'rb') as f:
+        if stat.st_size == 0:
+            return RecordIndex(file_path, [], [], [], [])
+        index, pos, prefix_hash = _resume(file_path, f, saved, stat.st_size)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for start, end in scan_records(mm, pos, tag):
+                index.starts.append(start)
+                index.ends.append(end)
+                index.ids.append(_field(mm, start, end, b"id"))
+                index.nums.append(_field(mm, start, end, b"num"))
+            index._positions = {}
+
+        if persist:
+            if index.ends:
+                _update_hash(prefix_hash, f, pos, index.ends[-1])
+            try:
+                index.save(stat.st_size, stat.st_mtime_ns, prefix_hash.hexdigest())
+            except OSError:
+                pass
+    return index
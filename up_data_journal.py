@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+
+from up_data import write_xml
+from up_data_cache import file_key, key_is_current, write_cache
+
+JOURNAL_VERSION = 1
+
+# One JSON array per line, appended and fsynced as each edit happens:
+#   ["base", key]                the file the edits apply to (see file_key)
+#   ["add", {tag: text, ...}]    append_row()
+#   ["set", row, column, text]   set_value()
+#   ["delete", row]              delete_row()
+
+
+def journal_path_for(file_path):
+    return file_path + ".journal"
+
+
+def _fsync_dir(path):
+    if hasattr(os, "O_DIRECTORY"):  # Not on Windows, where renames need no flush
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _is_text(value):
+    return isinstance(value, str)
+
+
+def _is_row(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+# The arguments each kind of record takes, as checks
+_RECORD_SHAPES = {
+    # [version, size, mtime_ns, digest], see file_key()
+    "base": (lambda key: isinstance(key, list) and len(key) == 4 and all(map(_is_text, key))
+             and all(part.isdigit() for part in key[:3]),),
+    "add": (lambda row_values: isinstance(row_values, dict) and all(map(_is_text, row_values.values())),),
+    "set": (_is_row, _is_text, _is_text),
+    "delete": (_is_row,),
+}
+
+
+def valid_record(record):
+    if not isinstance(record, list) or not record or not isinstance(record[0], str):
+        return False
+    checks = _RECORD_SHAPES.get(record[0])
+    return (checks is not None and len(record) == len(checks) + 1
+            and all(check(value) for check, value in zip(checks, record[1:])))
+
+
+# Return (base key, records) of a journal file, stopping at a line cut short
+# by a crash or one that is not a record of the right shape
+def read_journal(path):
+    key = None
+    records = []
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not valid_record(record) or (record[0] == "base") != (key is None):
+                break
+            if key is None:
+                key = record[1]
+            else:
+                records.append(record)
+    return key, records
+
+
+def apply_record(table, record):
+    op = record[0]
+    if op == "add":
+        table.append_row(record[1])
+    elif op == "set":
+        table.set_value(record[1], table.add_column(record[2]), record[3])
+    elif op == "delete":
+        table.delete_row(record[1])
+    else:
+        raise ValueError(f"Unknown journal record {op!r}")
+
+
+# Write-ahead log of the edits made to a loaded dataset file. Each edit costs
+# one appended line instead of rewriting the XML; open() replays the edits
+# over the file, and compact() writes them into the file in the background.
+# The journal never compacts by itself: that rewrites the user's file, so it
+# is up to the caller (the editor's autosave). records counts the edits not
+# yet in the file.
+class EditJournal:
+    def __init__(self, file_path, table):
+        self.file_path = file_path
+        self.path = journal_path_for(file_path)
+        self.table = table
+        self.records = 0
+        # lock guards the journal file; compact_lock is held while compacting
+        self.lock = threading.Lock()
+        self.compact_lock = threading.Lock()
+        self.f = None
+
+    # Replay any journal left for file_path over table (loaded from that
+    # file) and return the journal, ready for new edits, and the number of
+    # edits replayed. A journal written for another version of the file can
+    # not be replayed; it is moved aside to <journal>.old.
+    @classmethod
+    def open(cls, file_path, table):
+        journal = cls(file_path, table)
+        # A crash while compacting can leave the new journal as .tmp
+        for path in (journal.path, journal.path + ".tmp"):
+            try:
+                key, records = read_journal(path)
+            except OSError:
+                continue
+            if key is not None and key_is_current(key, file_path, JOURNAL_VERSION):
+                break
+        else:
+            if os.path.exists(journal.path):
+                os.replace(journal.path, journal.path + ".old")
+            journal._start(file_key(file_path, JOURNAL_VERSION))
+            return journal, 0
+
+        for i, record in enumerate(records):
+            try:
+                apply_record(table, record)
+            except (ValueError, IndexError, KeyError, TypeError):
+                records = records[:i]  # Drop the records from a bad one on
+                break
+        journal._start(key, records)
+        journal.records = len(records)
+        return journal, len(records)
+
+    # Start an empty journal for a file that has just been written from
+    # table, so there is nothing to replay. A journal left from an older file
+    # of that name is moved aside to <journal>.old. key is the file's
+    # file_key(), if already known.
+    @classmethod
+    def create(cls, file_path, table, key=None):
+        journal = cls(file_path, table)
+        if os.path.exists(journal.path):
+            os.replace(journal.path, journal.path + ".old")
+        journal._start(key or file_key(file_path, JOURNAL_VERSION))
+        return journal
+
+    # Start a new journal file for the given base, holding the given records.
+    # Written aside and renamed over the old one, so there is always a
+    # complete journal on disk.
+    def _start(self, key, records=()):
+        if self.f is not None:
+            self.f.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._line(["base", key]))
+            for record in records:
+                f.write(self._line(record))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        _fsync_dir(self.path)
+        self.f = open(self.path, 'ab')
+
+    @staticmethod
+    def _line(record):
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode('utf-8') + b"\n"
+
+    def append(self, record):
+        self.extend([record])
+
+    # Append several records with one write and one fsync
+    def extend(self, records):
+        lines = [self._line(record) for record in records]
+        with self.lock:
+            self.f.write(b"".join(lines))
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.records += len(lines)
+
+    # Call after the edit has been made to the table
+    def add(self, row_values):
+        self.append(["add", row_values])
+
+    def add_rows(self, rows):
+        self.extend(["add", row_values] for row_values in rows)
+
+    def set(self, row, column, value):
+        self.append(["set", row, column, value])
+
+    def delete(self, row):
+        self.append(["delete", row])
+
+    # Write the table as it is now over the XML file and restart the journal
+    # with only the edits made since. Runs in a background thread, unless
+    # wait=True, and is skipped (returning False) if a compaction is already
+    # running; edits can go on meanwhile. With wait=True it waits for any
+    # running compaction instead. done(error) is called when it is over,
+    # with None or the exception that stopped it.
+    # Call it from the thread that edits the table, between edits: the
+    # snapshot and the journal offset are taken here and must match.
+    def compact(self, wait=False, done=None):
+        if not self.compact_lock.acquire(blocking=wait):
+            return False
+        with self.lock:
+            snapshot = self.table.copy()
+            offset = self.f.tell()
+            records = self.records
+        if wait:
+            self._compact(snapshot, offset, records, done)
+        else:
+            threading.Thread(target=self._compact, args=(snapshot, offset, records, done), daemon=True).start()
+        return True
+
+    def _compact(self, snapshot, offset, records, done=None):
+        tmp_path = self.file_path + ".tmp"
+        error = None
+        try:
+            write_xml(snapshot, tmp_path)
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            key = file_key(tmp_path, JOURNAL_VERSION)
+            with self.lock:
+                with open(self.path, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+                # New journal first, then the file: a crash in between leaves
+                # the new journal as .tmp, which open() picks up
+                tmp_journal = self.path + ".tmp"
+                with open(tmp_journal, 'wb') as f:
+                    f.write(self._line(["base", key]))
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.file_path)
+                self.f.close()
+                os.replace(tmp_journal, self.path)
+                _fsync_dir(self.path)
+                self.f = open(self.path, 'ab')
+                self.records -= records
+            try:
+                write_cache(self.file_path, snapshot)
+            except OSError:
+                pass
+        except Exception as e:
+            if done is None:
+                raise
+            error = e
+        finally:
+            self.compact_lock.release()
+        if done is not None:
+            done(error)
+
+    def close(self):
+        with self.lock:
+            if self.f is not None:
+                self.f.close()
+                self.f = None
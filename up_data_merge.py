@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from up_data import AbilityTable
+from up_data_cache import load_table, pack_table, unpack_table
+
+# How often a parallel load calls progress(), which is also how soon it
+# notices a cancel
+POLL_SECONDS = 0.1
+
+# What to do when two files hold different entries with the same id:
+#   "last"   the entry from the later file replaces the earlier one
+#   "first"  the earlier entry is kept
+#   "error"  raise MergeConflictError
+MERGE_POLICIES = ("last", "first", "error")
+
+
+class MergeConflictError(ValueError):
+    def __init__(self, value, first_path, second_path):
+        super(MergeConflictError, self).__init__(
+            f"id {value!r} has different entries in '{first_path}' and '{second_path}'")
+        self.value = value
+        self.first_path = first_path
+        self.second_path = second_path
+
+
+# Runs in a worker process; the table goes back packed into a few arrays
+def _load_packed(file_path, container, use_cache):
+    return pack_table(load_table(file_path, container, use_cache))
+
+
+# Load several dataset files at once, one per worker process (cached files
+# just read their cache). workers defaults to one per file, up to the number
+# of CPUs. start_method picks how the workers are started (e.g. "spawn" in a
+# GUI, which must not fork). Returns the tables in the order of file_paths.
+# progress(files_done, total_files) is called every POLL_SECONDS (between
+# files when loading in this process); it may raise to abandon the load,
+# which drops the files not yet started. use_cache=False neither reads nor
+# writes the files' caches.
+def load_tables(file_paths, workers=None, container="abilities", start_method=None, progress=None,
+                use_cache=True):
+    workers = min(workers or os.cpu_count() or 1, len(file_paths))
+    if workers <= 1:
+        tables = []
+        for file_path in file_paths:
+            if progress is not None:
+                progress(len(tables), len(file_paths))
+            tables.append(load_table(file_path, container, use_cache))
+        return tables
+
+    context = multiprocessing.get_context(start_method)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        futures = [pool.submit(_load_packed, file_path, container, use_cache) for file_path in file_paths]
+        pending = futures
+        while pending:
+            if progress is not None:
+                progress(len(futures) - len(pending), len(futures))
+            done, pending = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()  # A failed file ends the load straight away
+    except BaseException:
+        # Files already being read still finish in their processes
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return [unpack_table(future.result()) for future in futures]
+
+
+# Merge tables into one by id with a hash join: one {id: entry} dict, one
+# pass over every row. Entries keep the place where their id first appeared.
+# An entry without an id only matches an identical one, so copies of it in
+# several files are kept once. Columns are the union, in order of first
+# appearance. names label the tables in conflicts. Returns (table,
+# conflicts), conflicts being (id, first name, later name) for every id whose
+# entries differed.
+def merge_tables(tables, policy="last", names=None):
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy {policy!r}, expected one of {', '.join(MERGE_POLICIES)}")
+    names = names or [f"table {n}" for n in range(len(tables))]
+    records = []
+    sources = []
+    by_id = {}
+    conflicts = []
+    columns = {}
+    for table, name in zip(tables, names):
+        columns.update(dict.fromkeys(table.columns))
+        table_columns = table.columns
+        for row in zip(*table.values):
+            record = {column: value for column, value in zip(table_columns, row) if value is not None}
+            key = record.get("id") or frozenset(record.items())
+            i = by_id.get(key)
+            if i is None:
+                by_id[key] = len(records)
+                records.append(record)
+                sources.append(name)
+            elif records[i] != record:
+                if policy == "error":
+                    raise MergeConflictError(key, sources[i], name)
+                conflicts.append((key, sources[i], name))
+                if policy == "last":
+                    records[i] = record
+                    sources[i] = name
+
+    first = tables[0] if tables else AbilityTable()
+    merged = AbilityTable(columns, first.root_tag, first.container, first.entry_tag)
+    merged.append_rows(records, check_keys=False)
+    for table in tables:
+        merged.dropped.update(table.dropped)
+    return merged, conflicts
+
+
+# Load dataset files in parallel and merge them by id (see merge_tables),
+# with progress and use_cache as for load_tables
+def merge_files(file_paths, policy="last", workers=None, container="abilities", start_method=None,
+                progress=None, use_cache=True):
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy {policy!r}, expected one of {', '.join(MERGE_POLICIES)}")
+    tables = load_tables(file_paths, workers, container, start_method, progress, use_cache)
+    return merge_tables(tables, policy, file_paths)
@@ -0,0 +1,284 @@
+import re
+
+import numpy as np
+
+# Filters over the columns of an AbilityTable, e.g.
+#   origin == "Generation IV" and isavailable == 1 and effect contains "Flying"
+#
+#   query      := or_expr
+#   or_expr    := and_expr ("or" and_expr)*
+#   and_expr   := not_expr ("and" not_expr)*
+#   not_expr   := "not" not_expr | "(" query ")" | comparison
+#   comparison := column ("==" | "!=" | "<" | "<=" | ">" | ">=" | "contains") value
+#
+# A value is a "quoted" or 'quoted' string, a number or a bare word. Numbers
+# compare as numbers ("num == 91" matches "091"), strings as text. contains
+# ignores case. An entry without the field compares as empty text.
+
+_TOKEN_RE = re.compile(r"""\s*(?:("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|(==|!=|<=|>=|=|<|>|\(|\))|([^\s()<>=!"']+))""")
+_KEYWORDS = ("and", "or", "not", "contains")
+_COMPARISONS = ("==", "=", "!=", "<", "<=", ">", ">=", "contains")
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# Split a query into (kind, value) tokens, kind being "string", "number",
+# "word", "op" or a keyword
+def tokenize_query(query):
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = _TOKEN_RE.match(query, pos)
+        if match is None or match.end() == pos:
+            raise QuerySyntaxError(f"Unexpected {query[pos:].lstrip()[:10]!r}")
+        string, op, word = match.groups()
+        if string is not None:
+            tokens.append(("string", re.sub(r"\\(.)", r"\1", string[1:-1])))
+        elif op is not None:
+            tokens.append(("op", op))
+        elif word.lower() in _KEYWORDS:
+            tokens.append((word.lower(), word))
+        elif not np.isnan(_number(word)):
+            tokens.append(("number", float(word)))
+        else:
+            tokens.append(("word", word))
+        pos = match.end()
+    return tokens
+
+
+# Recursive descent parser producing a tree of tuples:
+# ("or", a, b), ("and", a, b), ("not", a) and ("compare", column, op, value)
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        if token[0] is None:
+            raise QuerySyntaxError("Unexpected end of query")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QuerySyntaxError("Empty query")
+        tree = self.or_expr()
+        if self.pos < len(self.tokens):
+            raise QuerySyntaxError(f"Unexpected {self.tokens[self.pos][1]!r}")
+        return tree
+
+    def or_expr(self):
+        tree = self.and_expr()
+        while self.peek()[0] == "or":
+            self.take()
+            tree = ("or", tree, self.and_expr())
+        return tree
+
+    def and_expr(self):
+        tree = self.not_expr()
+        while self.peek()[0] == "and":
+            self.take()
+            tree = ("and", tree, self.not_expr())
+        return tree
+
+    def not_expr(self):
+        kind, value = self.peek()
+        if kind == "not":
+            self.take()
+            return ("not", self.not_expr())
+        if (kind, value) == ("op", "("):
+            self.take()
+            tree = self.or_expr()
+            if self.take() != ("op", ")"):
+                raise QuerySyntaxError("Missing ')'")
+            return tree
+        return self.comparison()
+
+    def comparison(self):
+        kind, column = self.take()
+        if kind not in ("word", "string"):
+            raise QuerySyntaxError(f"Expected a column name, not {column!r}")
+        kind, op = self.take()
+        if kind == "contains":
+            op = "contains"
+        elif kind != "op" or op not in _COMPARISONS:
+            raise QuerySyntaxError(f"Expected a comparison after {column!r}, not {op!r}")
+        kind, value = self.take()
+        if kind not in ("string", "number", "word"):
+            raise QuerySyntaxError(f"Expected a value after {op!r}, not {value!r}")
+        return ("compare", column, "==" if op == "=" else op, (kind, value))
+
+
+def parse_query(query):
+    return _Parser(tokenize_query(query)).parse()
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+# Show whole numbers without the ".0" a float literal would add
+def _literal_text(number):
+    return str(int(number)) if number == int(number) else str(number)
+
+
+# Columnar view of an AbilityTable for filtering. Each column is factorized
+# once into integer codes and its distinct values, so a comparison is decided
+# once per distinct value and then spread over the rows with one gather.
+# Like SortKeys, edits update single rows and appended rows are coded on the
+# next query.
+class QueryColumns:
+    def __init__(self, table):
+        self.table = table
+        self.codes = {}
+        self.categories = {}
+        self.category_index = {}
+        # Per column: the numbers of its distinct values, and their casefolded
+        # text joined by "\0" with the offset where each one starts
+        self.numbers = {}
+        self.folded = {}
+
+    def _factorize(self, col):
+        column_values = self.table.values[col]
+        index = self.category_index.get(col)
+        if index is None:
+            index = self.category_index[col] = {}
+            self.categories[col] = []
+            codes = np.zeros(0, dtype=np.int32)
+        else:
+            codes = self.codes[col]
+        start = len(codes)
+        if start < len(column_values):
+            new_codes = np.fromiter((index.setdefault(value or "", len(index)) for value in column_values[start:]),
+                                    dtype=np.int32, count=len(column_values) - start)
+            self.categories[col].extend(list(index)[len(self.categories[col]):])
+            codes = np.concatenate([codes, new_codes])
+        self.codes[col] = codes
+        return codes
+
+    def column_codes(self, col):
+        codes = self.codes.get(col)
+        if codes is None or len(codes) < len(self.table):
+            codes = self._factorize(col)
+        return codes
+
+    # Numbers (NaN for text) of the column's distinct values, extended with
+    # any values added since the last call
+    def category_numbers(self, col):
+        categories = self.categories[col]
+        numbers = self.numbers.get(col, np.zeros(0, dtype=np.float64))
+        if len(numbers) < len(categories):
+            new_numbers = np.array([_number(category) for category in categories[len(numbers):]], dtype=np.float64)
+            numbers = self.numbers[col] = np.concatenate([numbers, new_numbers])
+        return numbers
+
+    def category_folded(self, col):
+        categories = self.categories[col]
+        text, starts = self.folded.get(col, ("", np.zeros(0, dtype=np.int64)))
+        if len(starts) < len(categories):
+            new_folded = [category.casefold() for category in categories[len(starts):]]
+            lengths = np.fromiter(map(len, new_folded), dtype=np.int64, count=len(new_folded)) + 1
+            new_starts = len(text) + np.cumsum(lengths) - lengths
+            text += "\0".join(new_folded) + "\0"
+            starts = np.concatenate([starts, new_starts])
+            self.folded[col] = (text, starts)
+        return text, starts
+
+    # Which distinct values contain needle: a scan of their joined text that
+    # skips to the next value after each match. Matches are mapped back to
+    # their values by offset.
+    def _contains(self, col, needle):
+        text, starts = self.category_folded(col)
+        hits = np.zeros(len(starts), dtype=bool)
+        if not needle:
+            hits[:] = True
+            return hits
+        positions = []
+        find = text.find
+        pos = find(needle)
+        while pos >= 0:
+            positions.append(pos)
+            pos = find(needle, find("\0", pos + len(needle)) + 1)
+        hits[np.searchsorted(starts, positions, side="right") - 1] = True
+        return hits
+
+    # Call after the cell at (row, col) has changed
+    def update_row(self, row, col):
+        codes = self.codes.get(col)
+        if codes is None or row >= len(codes):
+            return
+        index = self.category_index[col]
+        value = self.table.values[col][row] or ""
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(self.categories[col])
+            self.categories[col].append(value)
+        codes[row] = code
+
+    # Call when a row is deleted from the table
+    def delete_row(self, row):
+        for col, codes in self.codes.items():
+            if row < len(codes):
+                self.codes[col] = np.delete(codes, row)
+
+    def _compare(self, column, op, literal):
+        col = self.table.tag_index.get(column)
+        if col is None:
+            raise QuerySyntaxError(f"Unknown column {column!r}")
+        codes = self.column_codes(col)
+        categories = self.categories[col]
+        kind, value = literal
+
+        if op == "contains":
+            hits = self._contains(col, (_literal_text(value) if kind == "number" else value).casefold())
+        elif kind == "number":
+            with np.errstate(invalid="ignore"):
+                hits = _OPERATORS[op](self.category_numbers(col), value)
+        elif op in ("==", "!="):
+            code = self.category_index[col].get(value, -1)
+            return codes == code if op == "==" else codes != code
+        else:
+            hits = np.fromiter((_OPERATORS[op](category, value) for category in categories),
+                               dtype=bool, count=len(categories))
+        return hits[codes] if len(hits) else np.zeros(len(codes), dtype=bool)
+
+    def _evaluate(self, tree):
+        if tree[0] == "compare":
+            return self._compare(*tree[1:])
+        if tree[0] == "not":
+            return ~self._evaluate(tree[1])
+        left = self._evaluate(tree[1])
+        right = self._evaluate(tree[2])
+        return left & right if tree[0] == "and" else left | right
+
+    # Boolean mask over the table's rows. Raises QuerySyntaxError.
+    def mask(self, query):
+        return self._evaluate(parse_query(query))
+
+    def rows(self, query):
+        return np.flatnonzero(self.mask(query))
+
+
+# Rows of table matching query, e.g. query_rows(table, 'isavailable == 0')
+def query_rows(table, query):
+    return QueryColumns(table).rows(query)
@@ -0,0 +1,353 @@
+import os
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+
+import numpy as np
+
+from up_data import PROGRESS_EVERY
+from up_data_cache import file_key, key_is_current
+
+# The free-text columns searched by TextIndex
+TEXT_COLUMNS = ("gametext", "effect", "fieldeffect", "notes")
+# The name columns searched by NameIndex, one per language
+NAME_COLUMNS = ("name", "de_name", "jp_name")
+NAME_INDEX_VERSION = 2
+
+_TOKEN_RE = re.compile(r"\w+")
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.casefold()) if text else []
+
+
+# Split a query into phrases, each a list of tokens. Quoted text is one
+# phrase; every other word is a phrase of its own.
+def parse_query(query):
+    phrases = []
+    for quoted, word in _QUERY_RE.findall(query):
+        tokens = tokenize(quoted if quoted else word)
+        if tokens:
+            phrases.append(tokens)
+    return phrases
+
+
+# Adjacent word pairs are indexed too, keyed "word1 word2" (tokens never
+# contain a space), so a phrase is found from postings instead of by
+# re-reading the text of every candidate row
+def _index_keys(tokens):
+    keys = set(tokens)
+    keys.update(map(" ".join, zip(tokens, tokens[1:])))
+    return keys
+
+
+def _phrase_keys(phrase):
+    if len(phrase) == 1:
+        return phrase
+    return list(map(" ".join, zip(phrase, phrase[1:])))
+
+
+# Rows present in every postings array: walk the shortest and binary search
+# the others, vectorized with searchsorted
+def _intersect(lists):
+    lists = sorted(lists, key=len)
+    if not lists[0]:
+        return []
+    rows = np.frombuffer(lists[0], dtype=np.uint32)
+    for postings in lists[1:]:
+        other = np.frombuffer(postings, dtype=np.uint32)
+        positions = np.minimum(np.searchsorted(other, rows), len(other) - 1)
+        rows = rows[other[positions] == rows]
+        if not len(rows):
+            return []
+    return rows.tolist()
+
+
+def _contains(postings, row):
+    i = bisect_left(postings, row)
+    return i < len(postings) and postings[i] == row
+
+
+# Renumber the postings after `row` was deleted from the table
+def _shift_rows(postings_for, row):
+    for postings in postings_for.values():
+        start = bisect_left(postings, row)
+        if start < len(postings):
+            np.frombuffer(postings, dtype=np.uint32)[start:] -= 1
+
+
+def _contains_phrase(tokens, phrase):
+    n = len(phrase)
+    return any(tokens[i:i + n] == phrase for i in range(len(tokens) - n + 1))
+
+
+# Inverted index from token to the sorted rows of an AbilityTable that contain
+# it in any of the text columns. Postings are compact unsigned int arrays.
+# Rows can be re-indexed after an edit with remove_row()/add_row().
+# progress(rows_done, total_rows) is called every PROGRESS_EVERY rows of the
+# build; it may raise to abandon it.
+class TextIndex:
+    def __init__(self, table, columns=TEXT_COLUMNS, progress=None):
+        self.table = table
+        self.columns = [c for c in columns if c in table.tag_index]
+        self.postings = {}
+        postings_for = self.postings
+        findall = _TOKEN_RE.findall
+        text_values = [table.column(column) for column in self.columns]
+        for row, texts in enumerate(zip(*text_values)):
+            if progress is not None and row % PROGRESS_EVERY == 0:
+                progress(row, table.row_count)
+            keys = set()
+            for text in texts:
+                if text:
+                    tokens = findall(text.casefold())
+                    keys.update(tokens)
+                    keys.update(map(" ".join, zip(tokens, tokens[1:])))
+            for key in keys:
+                postings = postings_for.get(key)
+                if postings is None:
+                    postings = postings_for[key] = array('I')
+                postings.append(row)
+
+    def row_tokens(self, row):
+        keys = set()
+        for column in self.columns:
+            keys.update(_index_keys(tokenize(self.table.column(column)[row])))
+        return keys
+
+    # Start covering a column the table has gained, e.g. from an import. It
+    # is empty in the rows indexed so far, so only later rows add postings.
+    def add_column(self, column, rows):
+        self.columns.append(column)
+
+    # Index a row that was appended or has just been edited
+    def add_row(self, row):
+        for token in self.row_tokens(row):
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = array('I')
+            if not _contains(postings, row):
+                insort(postings, row)
+
+    # Call before a row's text changes, with the old text still in the table
+    def remove_row(self, row):
+        for token in self.row_tokens(row):
+            postings = self.postings.get(token)
+            if postings is not None and _contains(postings, row):
+                del postings[bisect_left(postings, row)]
+
+    # Call before the row is deleted from the table
+    def delete_row(self, row):
+        self.remove_row(row)
+        _shift_rows(self.postings, row)
+
+    # Return the sorted rows matching every word and "quoted phrase"
+    def search(self, query):
+        phrases = parse_query(query)
+        if not phrases:
+            return []
+        keys = {key for phrase in phrases for key in _phrase_keys(phrase)}
+        empty = array('I')
+        rows = _intersect([self.postings.get(key, empty) for key in keys])
+
+        # Pairs can match out of order for phrases of three or more words
+        long_phrases = [phrase for phrase in phrases if len(phrase) > 2]
+        if long_phrases:
+            rows = [row for row in rows if self._row_has_phrases(row, long_phrases)]
+        return rows
+
+    def _row_has_phrases(self, row, phrases):
+        texts = [tokenize(self.table.column(column)[row]) for column in self.columns]
+        return all(any(_contains_phrase(tokens, phrase) for tokens in texts) for phrase in phrases)
+
+
+# Katakana ァ..ヶ sit exactly 0x60 code points above their hiragana
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+# Dakuten and handakuten change the kana, so they are not dropped as accents
+_KANA_MARKS = ("\u3099", "\u309a")
+
+
+# str.translate() table for decomposed text: drops combining marks and maps
+# katakana to hiragana, deciding each character the first time it is seen
+class _FoldTable(dict):
+    def __missing__(self, code):
+        char = chr(code)
+        value = None if unicodedata.combining(char) and char not in _KANA_MARKS else code
+        self[code] = value
+        return value
+
+
+_FOLD_TABLE = _FoldTable(_KATAKANA_TO_HIRAGANA)
+
+
+def _is_cjk(char):
+    code = ord(char)
+    return 0x3040 <= code <= 0x30FF or 0x3400 <= code <= 0x9FFF or 0xF900 <= code <= 0xFAFF
+
+
+# Fold a name so that spellings which should match do: NFKC (full/half width),
+# case folding (ß -> ss), accents and umlauts dropped (ä -> a) and katakana
+# turned into hiragana. See index_name() for umlauts spelt out (ä -> ae).
+def normalize_name(text):
+    if not text:
+        return ""
+    return _drop_marks(unicodedata.normalize("NFKC", text).casefold())
+
+
+def _drop_marks(text):
+    return unicodedata.normalize("NFC", unicodedata.normalize("NFD", text).translate(_FOLD_TABLE))
+
+
+# German umlauts, spelt out as they are where they cannot be typed
+_SPELT_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue"})
+
+
+# A name as NameIndex keeps it: normalize_name(), and for a name with umlauts
+# also the spelling with them spelt out (Frühwecker -> fruehwecker), after a
+# "\0" no query contains. Either spelling of the query then matches.
+def index_name(text):
+    if not text:
+        return ""
+    folded = unicodedata.normalize("NFKC", text).casefold()
+    name = _drop_marks(folded)
+    if folded.isascii():
+        return name
+    spelt = folded.translate(_SPELT_UMLAUTS)
+    return name + "\0" + _drop_marks(spelt) if spelt != folded else name
+
+
+# Character bigrams of a normalized name, plus single characters for CJK text
+# where one character can already be a meaningful query
+def _name_grams(text):
+    grams = {text[i:i + 2] for i in range(len(text) - 1)}
+    grams.update(char for char in text if _is_cjk(char))
+    return grams
+
+
+def _query_grams(text):
+    if len(text) >= 2:
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+    return {text} if _is_cjk(text) else None
+
+
+def name_index_path_for(file_path):
+    return file_path + ".names.npz"
+
+
+# Character n-gram index over the name columns in every language. A lookup
+# intersects the postings of the query's n-grams and then checks the few
+# candidates for the normalized query as a substring, so partial names match
+# in any of the languages. progress works as for TextIndex.
+class NameIndex:
+    def __init__(self, table, columns=NAME_COLUMNS, build=True, progress=None):
+        self.table = table
+        self.columns = [c for c in columns if c in table.tag_index]
+        self.names = [[] for _ in self.columns]
+        self.postings = {}
+        if build:
+            for row in range(len(table)):
+                if progress is not None and row % PROGRESS_EVERY == 0:
+                    progress(row, len(table))
+                self.add_row(row)
+
+    def _row_grams(self, row):
+        grams = set()
+        for names in self.names:
+            grams.update(_name_grams(names[row]))
+        return grams
+
+    # Start covering a column the table has gained, as TextIndex.add_column()
+    def add_column(self, column, rows):
+        self.columns.append(column)
+        self.names.append([""] * rows)
+
+    # Index a row that was appended or has just been edited
+    def add_row(self, row):
+        for names, column in zip(self.names, self.columns):
+            name = index_name(self.table.column(column)[row])
+            if row < len(names):
+                names[row] = name
+            else:
+                names.append(name)
+        for gram in self._row_grams(row):
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = array('I')
+            if not postings or postings[-1] < row:
+                postings.append(row)
+            elif not _contains(postings, row):
+                insort(postings, row)
+
+    # Call before a row's names change
+    def remove_row(self, row):
+        for gram in self._row_grams(row):
+            postings = self.postings.get(gram)
+            if postings is not None and _contains(postings, row):
+                del postings[bisect_left(postings, row)]
+
+    # Call before the row is deleted from the table
+    def delete_row(self, row):
+        self.remove_row(row)
+        for names in self.names:
+            del names[row]
+        _shift_rows(self.postings, row)
+
+    # Return the sorted rows with any name containing the query
+    def search(self, query):
+        query = normalize_name(query.strip())
+        if not query:
+            return []
+        grams = _query_grams(query)
+        if grams is None:
+            candidates = range(len(self.table))  # A single Latin letter
+        else:
+            empty = array('I')
+            candidates = _intersect([self.postings.get(gram, empty) for gram in grams])
+        return [row for row in candidates if any(query in names[row] for names in self.names)]
+
+    def save(self, path, key):
+        grams = list(self.postings)
+        lengths = np.array([len(self.postings[gram]) for gram in grams], dtype=np.int64)
+        rows = np.concatenate([np.frombuffer(self.postings[gram], dtype=np.uint32) for gram in grams]) \
+            if grams else np.zeros(0, dtype=np.uint32)
+        names = {f"names{i}": np.array(names, dtype=str) for i, names in enumerate(self.names)}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, key=np.array(key), columns=np.array(self.columns, dtype=str),
+                     grams=np.array(grams, dtype=str), lengths=lengths, rows=rows, **names)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, table):
+        with np.load(path) as saved:
+            index = cls(table, saved["columns"].tolist(), build=False)
+            index.names = [saved[f"names{i}"].tolist() for i in range(len(index.columns))]
+            rows = saved["rows"]
+            ends = np.cumsum(saved["lengths"])
+            starts = ends - saved["lengths"]
+            for gram, start, end in zip(saved["grams"].tolist(), starts.tolist(), ends.tolist()):
+                index.postings[gram] = array('I', rows[start:end].tobytes())
+        return index
+
+
+# Load the saved NameIndex for a dataset file, or build and save one if the
+# file has changed since (or there is none yet), with progress as for
+# TextIndex
+def load_name_index(file_path, table, progress=None):
+    path = name_index_path_for(file_path)
+    try:
+        with np.load(path) as saved:
+            current = key_is_current(saved["key"].tolist(), file_path, NAME_INDEX_VERSION)
+        if current:
+            return NameIndex.load(path, table)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    index = NameIndex(table, progress=progress)
+    try:
+        index.save(path, file_key(file_path, NAME_INDEX_VERSION))
+    except OSError:
+        pass
+    return index
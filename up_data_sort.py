@@ -0,0 +1,110 @@
+import numpy as np
+
+from up_data_search import normalize_name
+
+# Columns compared as numbers instead of text ("91" before "100")
+NUMERIC_COLUMNS = ("num",)
+INTEGER_COLUMNS = ("isavailable",)
+# Text is compared on its first characters only, which keeps the key arrays
+# of long free-text columns small
+SORT_KEY_LENGTH = 32
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return -np.inf  # Empty or not a number: sorts first
+
+
+def _integer(text):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        return -1
+
+
+# Collation key for text: case, accents and width are ignored and katakana
+# sorts with the matching hiragana
+def _text_key(text):
+    if not text:
+        return ""
+    if text.isascii():
+        return text[:SORT_KEY_LENGTH].casefold()
+    return normalize_name(text[:SORT_KEY_LENGTH])[:SORT_KEY_LENGTH]
+
+
+def _key_function(column):
+    if column in NUMERIC_COLUMNS:
+        return _number
+    if column in INTEGER_COLUMNS:
+        return _integer
+    return _text_key
+
+
+def sort_key(column, value):
+    return _key_function(column)(value)
+
+
+# Sort keys of every value in a column as one NumPy array
+def column_sort_keys(column, column_values):
+    key = _key_function(column)
+    if key is _number:
+        return np.array([key(value) for value in column_values], dtype=np.float64)
+    if key is _integer:
+        return np.array([key(value) for value in column_values], dtype=np.int64)
+    keys = [key(value) for value in column_values]
+    return np.array(keys, dtype=str) if keys else np.zeros(0, dtype="U1")
+
+
+# Stable ascending or descending argsort
+def argsort(keys, ascending=True):
+    if ascending:
+        return np.argsort(keys, kind="stable")
+    # Sort the reversed keys so rows with equal keys keep their order
+    return len(keys) - 1 - np.argsort(keys[::-1], kind="stable")[::-1]
+
+
+# Sort key arrays for the columns of an AbilityTable, each computed the first
+# time the column is sorted and then kept. An edit only recomputes the key of
+# the edited cell, and rows appended since are keyed on the next sort.
+class SortKeys:
+    def __init__(self, table):
+        self.table = table
+        self.keys = {}
+
+    def column_keys(self, col):
+        column = self.table.columns[col]
+        keys = self.keys.get(col)
+        if keys is None:
+            keys = self.keys[col] = column_sort_keys(column, self.table.values[col])
+        elif len(keys) < len(self.table):
+            new_keys = column_sort_keys(column, self.table.values[col][len(keys):])
+            keys = self.keys[col] = np.concatenate([keys, new_keys])
+        return keys
+
+    # Call after the cell at (row, col) has changed
+    def update_row(self, row, col):
+        keys = self.keys.get(col)
+        if keys is None or row >= len(keys):
+            return
+        key = sort_key(self.table.columns[col], self.table.values[col][row])
+        if isinstance(key, str) and len(key) > keys.itemsize // 4:
+            # Assigning a longer string would cut it to the array's width
+            keys = self.keys[col] = keys.astype(f"U{len(key)}")
+        keys[row] = key
+
+    # Call when a row is deleted from the table
+    def delete_row(self, row):
+        for col, keys in self.keys.items():
+            if row < len(keys):
+                self.keys[col] = np.delete(keys, row)
+
+    # Return table rows in order of column col. rows limits the sort to those
+    # rows (e.g. search results); otherwise every row is sorted.
+    def argsort(self, col, ascending=True, rows=None):
+        keys = self.column_keys(col)
+        if rows is None:
+            return argsort(keys, ascending)
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[argsort(keys[rows], ascending)]